@@ -1,24 +1,65 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, Response, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 import os
+import time
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-import shutil
-from ingest import ingest_all
-from retriever import get_context_scoped
+import anyio
+import warmup
+import metrics
+from http_cache import cached_response, json_body, json_response, make_etag, not_modified, precompress
+from inventory import FileInventory
+from upload_stream import receive_upload
+from retriever import get_context_scoped, get_syllabus_chunks, ingest_generation, is_ingested, close_db, evict_idle
+from subject_registry import registry
 from mcq_generator import generate_mcqs
 from flashcard_generator import generate_flashcards
+from prefetch import Prefetcher, ResultCache, cache_key, topic_key
+from executors import EMBED, LLM, INGEST, ExecutorBusy, shutdown_all
+from config import (
+    DATA_DIR, PREFETCH_ENABLED, MAX_UPLOAD_BYTES, WARMUP_ON_STARTUP,
+    PROFILE_SLOW_REQUEST_MS, PROFILE_LOG, GENERATE_CACHE_MAX_AGE, WARMUP_MAX_SUBJECTS,
+)
 
-# ====== Config ======
-DATA_DIR = Path("data")
-ALLOWED_SUBJECTS = ["CS3491", "MA3251"]  # extend as needed
+EVICT_INTERVAL = 60   # seconds between idle-subject sweeps
 
 # Ensure base data dir exists
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-app = FastAPI(title="Adaptive Learning Demo API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /livez answers immediately; /readyz tracks progress.
+    # Only the most recently used subjects are opened; the rest load on first query.
+    app.state.warm_subjects = await asyncio.to_thread(registry.recent, WARMUP_MAX_SUBJECTS)
+    if WARMUP_ON_STARTUP:
+        warmup.register(app.state.warm_subjects)
+        app.state.warmup_task = asyncio.create_task(
+            asyncio.to_thread(warmup.run_warmup, app.state.warm_subjects)
+        )
+    else:
+        warmup.state.set("warmup", "skipped")
+    evictor = asyncio.create_task(evict_idle_subjects())
+    yield
+    evictor.cancel()
+    prefetcher.shutdown()
+    shutdown_all()
+
+async def evict_idle_subjects():
+    """Close subject indexes nobody has queried for SUBJECT_IDLE_SECONDS."""
+    while True:
+        await asyncio.sleep(EVICT_INTERVAL)
+        try:
+            await asyncio.to_thread(evict_idle)
+        except Exception as e:
+            print(f"⚠️ Idle subject eviction failed: {e}")
+
+app = FastAPI(title="Adaptive Learning Demo API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For demo, allow all. For prod, restrict to your frontend domain.
@@ -27,100 +68,253 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.mount("/static", StaticFiles(directory="static"), name="static")
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "2"})
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Reject oversized uploads before the multipart body is parsed."""
+    if request.url.path.startswith("/upload/"):
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": "File too large"})
+    return await call_next(request)
+
+PROBE_PATHS = {"/livez", "/readyz", "/health", "/metrics"}
+
+@app.middleware("http")
+async def track_first_success(request: Request, call_next):
+    """Record time-to-first-successful-request (probes don't count)."""
+    response = await call_next(request)
+    if response.status_code < 400 and request.url.path not in PROBE_PATHS:
+        warmup.state.mark_success()
+    return response
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """Request id, per-route latency histogram and opt-in stage profiling."""
+    request_id = request.headers.get("x-request-id") or metrics.new_request_id()
+    with metrics.trace_request(request_id) as trace:
+        t0 = time.perf_counter()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - t0
+
+    route = request.scope.get("route")
+    route_path = getattr(route, "path", "unmatched")   # template, not the raw URL
+    metrics.REQUEST_SECONDS.observe(elapsed, method=request.method, route=route_path,
+                                    status=response.status_code)
+    response.headers["X-Request-ID"] = request_id
+    if request.headers.get("x-profile") == "1":
+        response.headers["Server-Timing"] = metrics.server_timing(trace + [("total", elapsed)])
+    if PROFILE_SLOW_REQUEST_MS is not None and elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+        record = {
+            "request_id": request_id, "method": request.method, "path": request.url.path,
+            "status": response.status_code, "total_ms": round(elapsed * 1000, 1),
+            "stages": [{"stage": name, "ms": round(sec * 1000, 1)} for name, sec in trace],
+        }
+        await anyio.to_thread.run_sync(metrics.dump_profile, PROFILE_LOG, record)
+    return response
+
+# ====== Generation + prefetch ======
+def retrieve_context(subject_code: str, query: str) -> str:
+    return get_context_scoped(query, subject_code, k=8, sources=["notes", "syllabus"])
+
+def generate_from_context(kind: str, subject_code: str, context: str, params: tuple = ()):
+    if kind == "mcqs":
+        return generate_mcqs({"subject_code": subject_code}, context) or []
+    num_cards, = params
+    return generate_flashcards({"subject_code": subject_code}, context, num_cards) or []
+
+def run_generation(kind: str, subject_code: str, query: str, params: tuple = ()):
+    """Retrieve context and generate MCQs or flashcards (blocking; used by prefetch)."""
+    return generate_from_context(kind, subject_code, retrieve_context(subject_code, query), params)
+
+def run_ingest(subject_code: str):
+    """Blocking ingest. The PDF/OCR/splitter/Chroma stack is imported here, on the INGEST worker,
+    so the first /ingest doesn't stall the event loop with imports."""
+    from ingest import ingest_all
+    return ingest_all(subject_code)
+
+result_cache = ResultCache()
+inventory = FileInventory(DATA_DIR)
+prefetcher = Prefetcher(run_generation, get_syllabus_chunks, result_cache,
+                        generation_loader=ingest_generation, enabled=PREFETCH_ENABLED)
+
+def session_id(request: Request) -> str:
+    """Client session for prefetch tracking: X-Session-Id header, else client address."""
+    return request.headers.get("x-session-id") or (request.client.host if request.client else "anonymous")
+
+def cached_result(key: tuple, prefetch_key: tuple | None) -> tuple | None:
+    """(result, etag) from the result cache, or from the set prefetched for the query's syllabus topic."""
+    entry = result_cache.lookup(key)
+    if entry is None and prefetch_key is not None:
+        entry = result_cache.lookup(prefetch_key)
+    return entry
+
+async def generate(kind: str, subject_code: str, query: str, params: tuple = ()):
+    with prefetcher.foreground():
+        context = await EMBED.run(retrieve_context, subject_code, query)
+        return await LLM.run(generate_from_context, kind, subject_code, context, params)
+
+async def schedule_prefetch(request: Request, kind: str, subject_code: str, query: str,
+                            params: tuple, topic_index: int | None):
+    try:
+        await EMBED.run(prefetcher.observe, session_id(request), subject_code, query, kind, params, topic_index)
+    except ExecutorBusy:
+        pass   # prefetch is best-effort; skip it under load
+
+def check_subject(subject_code: str):
+    if not registry.exists(subject_code):
+        raise HTTPException(status_code=400, detail="Invalid subject_code")
+
 # ====== Routes ======
 @app.get("/subjects")
 def list_subjects():
-    """List allowed subjects"""
-    return {"subjects": ALLOWED_SUBJECTS}
-
-@app.post("/upload/{subject_code}")
-async def upload_pdf(subject_code: str,
-    category: str = Form(...),
-    file: UploadFile = File(...)
-):
-    """Upload a PDF to a given subject/category."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
-    if category not in ["syllabus", "notes", "past_papers"]:
-        raise HTTPException(status_code=400, detail="Invalid category")
-    if not file.filename.lower().endswith(".pdf"):
-        raise HTTPException(status_code=400, detail="Only PDF files allowed")
+    """List registered subjects with their ingest state (read from the registry only)."""
+    return {"subjects": registry.codes(), "details": registry.records()}
+
+@app.post("/subjects/{subject_code}")
+def register_subject(subject_code: str, name: str | None = None):
+    """Register a new subject (or rename an existing one)."""
+    try:
+        return registry.register(subject_code, name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    save_dir = DATA_DIR / subject_code / category
-    save_dir.mkdir(parents=True, exist_ok=True)
-    save_path = save_dir / file.filename
+@app.delete("/subjects/{subject_code}")
+def unregister_subject(subject_code: str):
+    """Remove a subject from the registry and close its index. Uploaded files and the index stay on disk."""
+    if not registry.remove(subject_code):
+        raise HTTPException(status_code=404, detail="Subject not found")
+    close_db(subject_code)
+    prefetcher.invalidate(subject_code)
+    return {"status": "removed", "subject_code": subject_code}
 
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+UPLOAD_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["category", "file"],
+    "properties": {"category": {"type": "string", "enum": ["syllabus", "notes", "past_papers"]},
+                   "file": {"type": "string", "format": "binary"}}}}}}}
+
+@app.post("/upload/{subject_code}", openapi_extra=UPLOAD_FORM)
+async def upload_pdf(subject_code: str, request: Request):
+    """Upload a PDF to a given subject/category (multipart form: category, file)."""
+    check_subject(subject_code)
+
+    # The body is parsed as it arrives (see upload_stream): one copy to disk, size enforced
+    # while reading. The temp name is unique so concurrent uploads of one file can't interleave,
+    # and it lives outside the category dir so only the final rename changes that dir.
+    tmp_dir = DATA_DIR / subject_code / ".uploads"
+    await anyio.to_thread.run_sync(lambda: tmp_dir.mkdir(parents=True, exist_ok=True))
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}.part"
+    try:
+        upload = await receive_upload(request, tmp_path, MAX_UPLOAD_BYTES)
+        category = upload["fields"].get("category")
+        if category not in ["syllabus", "notes", "past_papers"]:
+            raise HTTPException(status_code=400, detail="Invalid category")
+        if not upload["filename"].lower().endswith(".pdf"):
+            raise HTTPException(status_code=400, detail="Only PDF files allowed")
+
+        save_dir = DATA_DIR / subject_code / category
+        save_path = save_dir / Path(upload["filename"]).name
+        await anyio.to_thread.run_sync(lambda: save_dir.mkdir(parents=True, exist_ok=True))
+        before = await anyio.to_thread.run_sync(inventory.mtime, subject_code, category)
+        await anyio.to_thread.run_sync(os.replace, tmp_path, save_path)
+        inventory.add(subject_code, category, save_path.name, before)
+    except BaseException:
+        await anyio.to_thread.run_sync(lambda: tmp_path.unlink(missing_ok=True))
+        raise
 
     return {"status": "saved", "subject_code": subject_code, "category": category,
-            "path": str(save_path)}
+            "path": str(save_path), "size": upload["size"], "sha256": upload["sha256"]}
 
 @app.post("/ingest/{subject_code}")
-def ingest_subject(subject_code: str):
+async def ingest_subject(subject_code: str):
     
     """Run ingestion for this subject (syllabus+notes+past_papers)."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
-    ingest_all(subject_code)
+    check_subject(subject_code)
+    await INGEST.run(run_ingest, subject_code)
+    prefetcher.invalidate(subject_code)
+    inventory.refresh(subject_code)
 
     return {"status": "ingested", "subject_code": subject_code}
 
-@app.post("/generate/mcqs/{subject_code}")
-def generate_mcqs_api(subject_code: str, query: str):
+async def generated_response(request: Request, kind: str, subject_code: str, query: str,
+                             params: tuple = ()) -> Response:
+    """Generated set with a content-hash ETag, private caching and compression.
+
+    Each cached result keeps the ETag of its body, so an If-None-Match that matches the
+    cached entry gets its 304 before any retrieval or LLM work. Empty results are sent
+    with no-store and are not cached, so the next request generates again.
+    """
+    generation = await anyio.to_thread.run_sync(ingest_generation, subject_code)
+    # Topic matching may load the syllabus from Chroma on first use
+    topic_index = await EMBED.run(prefetcher.locate, subject_code, query)
+    key = cache_key(kind, subject_code, query, params, generation)
+    prefetch_key = topic_key(kind, subject_code, topic_index, params, generation) if topic_index is not None else None
+    cache_control = f"private, max-age={GENERATE_CACHE_MAX_AGE}"
+
+    entry = cached_result(key, prefetch_key)
+    response = not_modified(request, entry[1], cache_control) if entry and entry[1] else None
+    if response is None:
+        result, etag = entry if entry else (await generate(kind, subject_code, query, params), None)
+        payload = {"subject_code": subject_code, kind: result}
+        if not result:
+            response = JSONResponse(payload, headers={"Cache-Control": "no-store"})
+        else:
+            body = json_body(payload)
+            if etag is None:   # fresh or prefetched: hash it and keep it under the query's own key
+                etag = make_etag(body, generation)
+                result_cache.put(key, result, etag=etag)
+            response = cached_response(request, body, "application/json", etag, cache_control)
+    # Runs after the response is sent, so a busy EMBED queue never delays it
+    response.background = BackgroundTask(schedule_prefetch, request, kind, subject_code, query, params, topic_index)
+    return response
+
+# GET lets browsers cache and revalidate (If-None-Match -> 304); POST is kept for existing clients
+@app.api_route("/generate/mcqs/{subject_code}", methods=["GET", "POST"])
+async def generate_mcqs_api(subject_code: str, query: str, request: Request):
     """Generate MCQs for a given subject/query from notes+syllabus."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
+    check_subject(subject_code)
 
-    context = get_context_scoped(query, subject_code, k=8, sources=["notes", "syllabus"])
-    mcqs = generate_mcqs({"subject_code": subject_code}, context) or []
-    return {"subject_code": subject_code, "mcqs": mcqs}
+    return await generated_response(request, "mcqs", subject_code, query)
 
-@app.post("/generate/flashcards/{subject_code}")
-def generate_flashcards_api(subject_code: str, query: str, num_cards: int = 8):
+@app.api_route("/generate/flashcards/{subject_code}", methods=["GET", "POST"])
+async def generate_flashcards_api(subject_code: str, query: str, request: Request, num_cards: int = 8):
     """Generate flashcards for a given subject/query from notes+syllabus."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
+    check_subject(subject_code)
 
-    context = get_context_scoped(query, subject_code, k=8, sources=["notes", "syllabus"])
-    cards = generate_flashcards({"subject_code": subject_code}, context, num_cards) or []
-    return {"subject_code": subject_code, "flashcards": cards}
+    return await generated_response(request, "flashcards", subject_code, query, (num_cards,))
+
+@app.get("/prefetch/stats")
+def prefetch_stats():
+    """Prefetch budget usage and hit rate."""
+    return prefetcher.report()
 
 # Add these routes to your app.py
 
 @app.get("/status/{subject_code}")
-def get_subject_status(subject_code: str):
+def get_subject_status(subject_code: str, request: Request):
     """Check if a subject has been ingested and what files are available."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
-    
-    # Check if vector database exists
-    chroma_path = Path(f"chroma_dbs/{subject_code}")
-    is_ingested = chroma_path.exists() and any(chroma_path.iterdir())
+    check_subject(subject_code)
     
-    # Check available files
-    subject_path = DATA_DIR / subject_code
-    files = {}
+    # Available files come from the cached inventory (kept current by upload/delete/ingest)
+    files = inventory.files(subject_code)
     
-    for category in ["syllabus", "notes", "past_papers"]:
-        category_path = subject_path / category
-        if category_path.exists():
-            files[category] = [f.name for f in category_path.glob("*.pdf")]
-        else:
-            files[category] = []
-    
-    return {
+    payload = {
         "subject_code": subject_code,
-        "is_ingested": is_ingested,
+        "is_ingested": is_ingested(subject_code),
+        "registry": registry.get(subject_code),
         "files": files,
         "total_files": sum(len(file_list) for file_list in files.values())
     }
+    return json_response(request, payload, ingest_generation(subject_code))
 
 @app.delete("/files/{subject_code}/{category}/{filename}")
 def delete_file(subject_code: str, category: str, filename: str):
     """Delete a specific uploaded file."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
+    check_subject(subject_code)
     
     if category not in ["syllabus", "notes", "past_papers"]:
         raise HTTPException(status_code=400, detail="Invalid category")
@@ -131,25 +325,44 @@ def delete_file(subject_code: str, category: str, filename: str):
         raise HTTPException(status_code=404, detail="File not found")
     
     try:
+        before = inventory.mtime(subject_code, category)
         os.remove(file_path)
+        inventory.remove(subject_code, category, filename, before)
         return {"status": "deleted", "file": filename}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of request/stage histograms and pipeline counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/livez")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness probe: 200 once embeddings, subject DBs and Ollama are warmed up."""
+    report = warmup.state.report()
+    if not report["ready"] and WARMUP_ON_STARTUP:
+        # Retry failed components in the background (rate-limited inside warmup)
+        asyncio.get_running_loop().run_in_executor(None, warmup.retry_failed, app.state.warm_subjects)
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
 @app.get("/health")
-def health_check():
-    """Basic health check endpoint."""
-    return {"status": "healthy", "message": "API is running"}
+async def health_check():
+    """Backwards-compatible health endpoint (liveness plus readiness summary)."""
+    return {"status": "healthy", "message": "API is running", "ready": warmup.state.ready}
 
 @app.post("/validate/query/{subject_code}")
-def validate_query(subject_code: str, query: str):
+async def validate_query(subject_code: str, query: str):
     """Validate if a query can generate meaningful results."""
-    if subject_code not in ALLOWED_SUBJECTS:
-        raise HTTPException(status_code=400, detail="Invalid subject_code")
+    check_subject(subject_code)
     
     # Check if subject is ingested
-    chroma_path = Path(f"chroma_dbs/{subject_code}")
-    if not (chroma_path.exists() and any(chroma_path.iterdir())):
+    if not await anyio.to_thread.run_sync(is_ingested, subject_code):
         return {
             "valid": False,
             "reason": "Subject documents not processed yet",
@@ -158,7 +371,7 @@ def validate_query(subject_code: str, query: str):
     
     # Try to get some context
     try:
-        context = get_context_scoped(query, subject_code, k=3, sources=["notes", "syllabus"])
+        context = await EMBED.run(get_context_scoped, query, subject_code, k=3, sources=["notes", "syllabus"])
         if not context or len(context.strip()) < 50:
             return {
                 "valid": False,
@@ -171,6 +384,8 @@ def validate_query(subject_code: str, query: str):
             "context_length": len(context),
             "message": "Query looks good for content generation"
         }
+    except ExecutorBusy:
+        raise
     except Exception as e:
         return {
             "valid": False,
@@ -178,32 +393,36 @@ def validate_query(subject_code: str, query: str):
             "suggestion": "Please try a different query"
         }
 
+# Frontend is read once and served from memory
+FRONTEND_PATH = Path("static/index.html")
+_frontend = None   # (body bytes, etag, pre-compressed bodies by encoding)
+
+def load_frontend():
+    global _frontend
+    if _frontend is None:
+        try:
+            body = FRONTEND_PATH.read_bytes()
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Frontend not found")
+        _frontend = (body, make_etag(body), precompress(body))
+    return _frontend
+
+def frontend_response(request: Request) -> Response:
+    body, etag, compressed = load_frontend()
+    return cached_response(request, body, "text/html; charset=utf-8", etag, "no-cache", compressed)
+
 @app.get("/", response_class=HTMLResponse)
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the main frontend application."""
-    try:
-        with open("static/index.html", "r", encoding="utf-8") as f:
-            html_content = f.read()
-        return HTMLResponse(content=html_content)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Frontend not found")
+    return frontend_response(request)
 
 @app.get("/app", response_class=HTMLResponse)
-async def serve_app():
+async def serve_app(request: Request):
     """Alternative endpoint to serve the frontend."""
-    return await serve_frontend()
+    return frontend_response(request)
 
 # Optional: Serve the HTML file directly
-@app.get("/index.html", response_class=FileResponse)
-async def serve_index():
+@app.get("/index.html", response_class=HTMLResponse)
+async def serve_index(request: Request):
     """Serve the index.html file directly."""
-    file_path = "static/index.html"
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path)
-
-# Health check endpoint (already suggested in previous response)
-@app.get("/health")
-def health_check():
-    """Basic health check endpoint."""
-    return {"status": "healthy", "message": "API is running", "frontend": "available"}
\ No newline at end of file
+    return frontend_response(request)
@@ -0,0 +1,276 @@
+# batch_generate.py
+"""
+Bulk generation of MCQ / flashcard sets from a job file.
+
+    python batch_generate.py jobs.jsonl -o quizzes.jsonl --concurrency 4
+    python batch_generate.py jobs.csv -o quizzes.jsonl      # run again to resume
+
+Job fields (JSONL keys or CSV columns):
+    id        optional, defaults to the job's line number ("line-7")
+    subject   subject code (subject_code is accepted too)
+    query     topic used for retrieval
+    type      "mcqs" or "flashcards"
+    count     number of items (default 10)
+    student   student profile: a JSON object (JSONL) or a JSON string (CSV);
+              CSV columns named student_<field> are added to it
+
+Every finished job is appended to the output as one JSON line and flushed
+immediately. On restart, jobs whose id already has an "ok" line are skipped.
+Jobs with the same subject + query share one retrieval, and jobs with the same
+(subject, query, type, count, student) share one generation; concurrent
+duplicates wait for the first instead of recomputing.
+"""
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from config import LLM_WORKERS
+from prefetch import cache_key
+from retriever import get_embeddings, get_context_scoped, is_ingested
+from mcq_generator import generate_mcqs
+from flashcard_generator import generate_flashcards
+from utils.stats_utils import percentile
+
+JOB_TYPES = {"mcq": "mcqs", "mcqs": "mcqs", "flashcard": "flashcards", "flashcards": "flashcards"}
+DEFAULT_COUNT = 10
+MAX_COUNT = 50
+
+
+class SharedCache:
+    """Memoizes results by key; concurrent callers of the same key wait for a single computation.
+
+    Failures and empty results are not kept, so a later job retries them.
+    """
+
+    def __init__(self):
+        self._futures = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, fn, *args):
+        with self._lock:
+            future = self._futures.get(key)
+            owner = future is None
+            if owner:
+                future = self._futures[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        if owner:
+            try:
+                value = fn(*args)
+            except BaseException as e:
+                self._forget(key)
+                future.set_exception(e)
+                raise
+            if not value:
+                self._forget(key)
+            future.set_result(value)
+        return future.result()
+
+    def _forget(self, key):
+        with self._lock:
+            self._futures.pop(key, None)
+
+
+def read_jobs(path: Path, fmt: str | None = None) -> list[dict]:
+    """Raw job dicts with a "_line" number, from JSONL or CSV (chosen by suffix unless fmt is given).
+
+    A JSONL line that can't be parsed becomes {"_line", "_error"}, so only that job fails.
+    """
+    fmt = fmt or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    jobs = []
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for line, row in enumerate(csv.DictReader(f), start=2):   # line 1 is the header
+                jobs.append({**row, "_line": line})
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    raw = json.loads(text)
+                except json.JSONDecodeError as e:
+                    jobs.append({"_line": line, "_error": f"not valid JSON: {e}"})
+                    continue
+                if not isinstance(raw, dict):
+                    jobs.append({"_line": line, "_error": "not a JSON object"})
+                    continue
+                jobs.append({**raw, "_line": line})
+    return jobs
+
+
+def normalize_job(raw: dict) -> dict:
+    """Validated job; raises ValueError with a readable message."""
+    if "_error" in raw:
+        raise ValueError(raw["_error"])
+    subject = _text_field(raw, "subject") or _text_field(raw, "subject_code")
+    query = _text_field(raw, "query")
+    kind = JOB_TYPES.get(str(raw.get("type") or "").strip().lower())
+    if not subject or not query:
+        raise ValueError("subject and query are required")
+    if kind is None:
+        raise ValueError(f"type must be one of {sorted(set(JOB_TYPES.values()))}, got {raw.get('type')!r}")
+    count = int(raw.get("count") or DEFAULT_COUNT)
+    if not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"count must be between 1 and {MAX_COUNT}")
+
+    student = raw.get("student") or {}
+    if isinstance(student, str):
+        student = json.loads(student)
+    if not isinstance(student, dict):
+        raise ValueError("student must be a JSON object")
+    for column, value in raw.items():
+        # CSV rows with more cells than the header put the extras under a None key
+        if isinstance(column, str) and column.startswith("student_") and value not in (None, ""):
+            student[column[len("student_"):]] = value
+    return {"subject": subject, "query": query, "type": kind, "count": count,
+            "student": {**student, "subject_code": subject}}
+
+
+def _text_field(raw: dict, name: str) -> str:
+    value = raw.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string, got {value!r}")
+    return value.strip()
+
+
+def completed_ids(output: Path) -> set:
+    """Ids of jobs that already have an "ok" line in the output (for resume)."""
+    done = set()
+    if not output.exists():
+        return done
+    with open(output, encoding="utf-8") as f:
+        for text in f:
+            try:
+                record = json.loads(text)
+            except json.JSONDecodeError:
+                continue   # partial last line from an interrupted run
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+class BatchRunner:
+    def __init__(self, output: Path, concurrency: int = LLM_WORKERS):
+        self.output = output
+        self.concurrency = concurrency
+        self.contexts = SharedCache()
+        self.generations = SharedCache()
+        self._write_lock = threading.Lock()
+
+    def _retrieve(self, subject: str, query: str) -> str:
+        # Same retrieval as the API's generate endpoints
+        return get_context_scoped(query, subject, k=8, sources=["notes", "syllabus"])
+
+    def _generate(self, job: dict, context: str) -> list:
+        if job["type"] == "mcqs":
+            return generate_mcqs(job["student"], context, job["count"]) or []
+        return generate_flashcards(job["student"], context, job["count"]) or []
+
+    def run_job(self, job_id: str, job: dict) -> dict:
+        t0 = time.perf_counter()
+        record = {"id": job_id, "subject": job["subject"], "query": job["query"],
+                  "type": job["type"], "count": job["count"]}
+        try:
+            if not is_ingested(job["subject"]):
+                raise ValueError(f"subject {job['subject']} is not ingested")
+            context = self.contexts.get(cache_key("context", job["subject"], job["query"]),
+                                        self._retrieve, job["subject"], job["query"])
+            if not context:
+                raise ValueError("no context retrieved")
+            profile = json.dumps(job["student"], sort_keys=True)
+            key = cache_key(job["type"], job["subject"], job["query"], (job["count"], profile))
+            items = self.generations.get(key, self._generate, job, context)
+            if not items:
+                raise ValueError("no valid items generated")
+            record.update(status="ok", items=items)
+        except Exception as e:
+            record.update(status="failed", error=str(e)[:500])
+        record["seconds"] = round(time.perf_counter() - t0, 3)
+        self.write(record)
+        return record
+
+    def write(self, record: dict):
+        with self._write_lock, open(self.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+
+    def run(self, jobs: list[tuple[str, dict]]) -> list[dict]:
+        records = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            futures = [pool.submit(self.run_job, job_id, job) for job_id, job in jobs]
+            for n, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                records.append(record)
+                mark = "✅" if record["status"] == "ok" else "❌"
+                detail = f"{len(record['items'])} items" if record["status"] == "ok" else record["error"]
+                print(f"{mark} [{n}/{len(jobs)}] {record['id']} ({record['seconds']}s): {detail}")
+        return records
+
+
+def print_summary(records: list[dict], invalid: int, skipped: int, seconds: float, runner: BatchRunner):
+    ok = [r for r in records if r["status"] == "ok"]
+    failed = len(records) - len(ok) + invalid
+    items = sum(len(r["items"]) for r in ok)
+    latencies = [r["seconds"] for r in records]
+    print("\n📊 Batch summary")
+    print(f"   jobs run:      {len(records)} ({skipped} already done, skipped)")
+    print(f"   succeeded:     {len(ok)}")
+    print(f"   failed:        {failed}" + (f" ({invalid} invalid)" if invalid else ""))
+    print(f"   items:         {items}")
+    print(f"   wall time:     {seconds:.1f}s")
+    if seconds > 0:
+        print(f"   throughput:    {len(records) / seconds:.2f} jobs/s, {items / seconds:.1f} items/s")
+    print(f"   job latency:   p50={percentile(latencies, 50):.2f}s p90={percentile(latencies, 90):.2f}s")
+    print(f"   cache hits:    retrieval {runner.contexts.hits}/{runner.contexts.hits + runner.contexts.misses}, "
+          f"generation {runner.generations.hits}/{runner.generations.hits + runner.generations.misses}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate MCQ / flashcard sets from a JSONL or CSV job file")
+    parser.add_argument("jobs", type=Path, help="job file (.jsonl or .csv)")
+    parser.add_argument("-o", "--output", type=Path, help="results JSONL (default: <jobs>.results.jsonl)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="job file format (default: by suffix)")
+    parser.add_argument("--concurrency", type=int, default=LLM_WORKERS, help="jobs in flight")
+    args = parser.parse_args(argv)
+    output = args.output or args.jobs.with_suffix(".results.jsonl")
+
+    runner = BatchRunner(output, max(1, args.concurrency))
+    done = completed_ids(output)
+    jobs, seen, invalid, skipped = [], set(), 0, 0
+    for raw in read_jobs(args.jobs, args.format):
+        job_id = str(raw.get("id") or f"line-{raw['_line']}")
+        if job_id in seen:
+            raise SystemExit(f"❌ duplicate job id {job_id!r} (line {raw['_line']})")
+        seen.add(job_id)
+        if job_id in done:
+            skipped += 1
+            continue
+        try:
+            jobs.append((job_id, normalize_job(raw)))
+        except (ValueError, TypeError) as e:   # TypeError/JSONDecodeError from a malformed student profile
+            invalid += 1
+            runner.write({"id": job_id, "status": "failed", "error": f"invalid job (line {raw['_line']}): {e}"})
+            print(f"❌ {job_id}: invalid job (line {raw['_line']}): {e}")
+
+    print(f"🗂️ {len(jobs)} jobs to run, {skipped} already done, writing to {output}")
+    if jobs:
+        get_embeddings()   # load the model once before the workers start
+    t0 = time.perf_counter()
+    records = runner.run(jobs)
+    failed = print_summary(records, invalid, skipped, time.perf_counter() - t0, runner)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# benchmarks/common.py
+"""Shared helpers for the benchmark and load-test scripts."""
+import json
+import os
+import platform
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+from utils.stats_utils import percentile
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def summarize(latencies: list[float]) -> dict:
+    """Latency summary in milliseconds."""
+    ms = [v * 1000 for v in latencies]
+    return {
+        "n": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p90_ms": round(percentile(ms, 90), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_metadata(args) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+    }
+
+
+def write_results(results: dict, out: Path | None, prefix: str) -> Path:
+    """Write a results JSON (default: benchmarks/results/<prefix>-<timestamp>.json)."""
+    if out is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"📊 Results written to {out}")
+    return out
+
+
+def wait_for_http(url: str, timeout: float = 30) -> bool:
+    """Poll a URL until it answers (any status) or the timeout expires."""
+    import urllib.error
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return True
+        except urllib.error.HTTPError:
+            return True
+        except Exception:
+            time.sleep(0.1)
+    return False
@@ -0,0 +1,73 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark/load-test result files and flag regressions.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json --threshold 10
+
+Latency-like metrics (`*_ms`, `*seconds`) regress when they grow, throughput
+metrics (`*_per_s`, `rps`) when they shrink. Exit code 1 if any metric
+regressed by more than the threshold (percent).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+SKIP = {"meta"}
+
+
+def flatten(data, prefix="") -> dict:
+    out = {}
+    for key, value in data.items():
+        if key in SKIP:
+            continue
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            out.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = value
+    return out
+
+
+def direction(path: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if not a performance metric."""
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s") or leaf in ("rps", "throughput_rps"):
+        return 1
+    if leaf.endswith("_ms") or leaf.endswith("seconds") or leaf in ("error_rate", "ocr_share"):
+        return -1
+    return 0
+
+
+def compare(old: dict, new: dict, threshold: float) -> list[tuple]:
+    rows = []
+    a, b = flatten(old), flatten(new)
+    for path in sorted(set(a) & set(b)):
+        sign = direction(path)
+        if not sign or a[path] == 0:
+            continue
+        change = (b[path] - a[path]) / abs(a[path]) * 100
+        regressed = -sign * change > threshold
+        rows.append((path, a[path], b[path], change, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    rows = compare(json.loads(args.old.read_text()), json.loads(args.new.read_text()), args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    for path, before, after, change, regressed in rows:
+        flag = "❌" if regressed else "  "
+        print(f"{flag} {path:<{width}}  {before:>12.3f} -> {after:>12.3f}  ({change:+.1f}%)")
+    regressions = [r for r in rows if r[4]]
+    print(f"\n{len(regressions)} regression(s) over {args.threshold}% in {len(rows)} compared metrics")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+# benchmarks/fake_ollama.py
+"""
+Deterministic stand-in for the Ollama HTTP API.
+
+Answers /api/generate with valid MCQ or flashcard JSON derived from the prompt
+(same prompt -> same output), so benchmarks run with no GPU and no network.
+Recorded real outputs can be replayed instead, keyed by the prompt's SHA-256.
+For load tests it can also emulate generation speed (tokens/s), a latency
+distribution and a failure rate:
+
+    python -m benchmarks.fake_ollama --port 11500
+    python -m benchmarks.fake_ollama --tokens-per-s 40 --latency-ms 300 --latency-dist lognormal --failure-rate 0.02
+    python -m benchmarks.fake_ollama --record rec.jsonl --upstream http://127.0.0.1:11434
+    python -m benchmarks.fake_ollama --replay rec.jsonl
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from config import OLLAMA_MODEL
+
+CONTEXT_RE = re.compile(r'Context:\s*"""(.*?)"""', re.DOTALL)
+COUNT_RE = re.compile(r"exactly (\d+)")
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def synthesize(prompt: str) -> str:
+    """Deterministic, schema-valid MCQ/flashcard JSON for a prompt."""
+    rng = random.Random(prompt_key(prompt))
+    context = CONTEXT_RE.search(prompt)
+    words = [w for w in re.findall(r"[A-Za-z]{4,}", context.group(1) if context else prompt)] or ["concept"]
+    count = int(COUNT_RE.search(prompt).group(1)) if COUNT_RE.search(prompt) else 10
+
+    if "flashcard" in prompt.lower():
+        items = [{"front": f"What is {' '.join(rng.sample(words, min(3, len(words))))}?",
+                  "back": " ".join(rng.choice(words) for _ in range(12)) + "."}
+                 for _ in range(count)]
+    else:
+        items = [{"question": f"Which statement about {' '.join(rng.sample(words, min(3, len(words))))} is correct?",
+                  "options": [" ".join(rng.choice(words) for _ in range(5)) for _ in range(4)],
+                  "correct_option": rng.choice("ABCD")}
+                 for _ in range(count)]
+    return json.dumps(items, indent=1)
+
+
+LATENCY_DISTS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure (returned to the client as HTTP 500)."""
+
+
+class FakeOllama:
+    def __init__(self, latency_ms: float = 0.0, replay: Path | None = None,
+                 record: Path | None = None, upstream: str | None = None,
+                 model: str = OLLAMA_MODEL, latency_dist: str = "fixed",
+                 tokens_per_s: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        if latency_dist not in LATENCY_DISTS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTS}")
+        self.latency_ms = latency_ms          # mean time-to-first-token
+        self.latency_dist = latency_dist
+        self.tokens_per_s = tokens_per_s      # 0 = respond instantly after the base latency
+        self.failure_rate = failure_rate
+        self.model = model   # reported by /api/tags so the app's warm-up accepts it
+        self.record = record
+        self.upstream = upstream
+        self.replay = {}
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)       # latency/failure draws are reproducible per seed
+        self._lock = threading.Lock()
+        if replay:
+            for line in Path(replay).read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self.replay[entry["key"]] = entry["response"]
+
+    def _draw_latency(self) -> float:
+        """Base latency in seconds from the configured distribution."""
+        mean = self.latency_ms / 1000
+        if mean <= 0 or self.latency_dist == "fixed":
+            return max(mean, 0.0)
+        if self.latency_dist == "uniform":
+            return self._rng.uniform(0, 2 * mean)
+        if self.latency_dist == "exponential":
+            return self._rng.expovariate(1 / mean)
+        # lognormal with sigma 0.75 and the requested mean: long right tail like real GPUs under load
+        sigma = 0.75
+        return self._rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    def complete(self, payload: dict) -> dict:
+        prompt = payload.get("prompt")
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+            latency = self._draw_latency()
+        if prompt is None:   # model load / keep-alive ping
+            return {"model": payload.get("model"), "response": "", "done": True}
+        if fail:
+            with self._lock:
+                self.failures += 1
+            time.sleep(latency)
+            raise FakeLLMError("injected failure")
+        key = prompt_key(prompt)
+        if key in self.replay:
+            text = self.replay[key]
+        elif self.upstream:
+            text = self._forward(payload)
+        else:
+            text = synthesize(prompt)
+        tokens = max(1, len(text) // 4)   # ~4 characters per token
+        if self.tokens_per_s:
+            latency += tokens / self.tokens_per_s
+        if latency:
+            time.sleep(latency)
+        return {"model": payload.get("model"), "response": text, "done": True,
+                "eval_count": tokens, "total_duration": int(latency * 1e9)}
+
+    def _forward(self, payload: dict) -> str:
+        req = urllib.request.Request(f"{self.upstream.rstrip('/')}/api/generate",
+                                     data=json.dumps({**payload, "stream": False}).encode(),
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            text = json.loads(resp.read())["response"]
+        if self.record:
+            with self._lock, open(self.record, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": prompt_key(payload["prompt"]), "response": text}) + "\n")
+        return text
+
+
+def make_handler(fake: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send(200, {"models": [{"name": fake.model}]})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/api/generate":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                self._send(200, fake.complete(payload))
+            except FakeLLMError as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start(port: int = 0, **options) -> tuple[ThreadingHTTPServer, FakeOllama]:
+    """Start the fake server in a daemon thread; returns (server, state)."""
+    fake = FakeOllama(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean base delay per generation")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTS, default="fixed")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="emulated generation speed (0 = instant)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of generations answered with 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", type=Path, help="JSONL of recorded outputs to serve by prompt hash")
+    parser.add_argument("--record", type=Path, help="append upstream outputs to this JSONL")
+    parser.add_argument("--upstream", help="real Ollama URL to forward unknown prompts to")
+    args = parser.parse_args()
+    server, _ = start(args.port, latency_ms=args.latency_ms, replay=args.replay,
+                      record=args.record, upstream=args.upstream, latency_dist=args.latency_dist,
+                      tokens_per_s=args.tokens_per_s, failure_rate=args.failure_rate, seed=args.seed)
+    print(f"🤖 Fake Ollama listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
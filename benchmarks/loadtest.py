@@ -0,0 +1,283 @@
+# benchmarks/loadtest.py
+"""
+Concurrent load test for the FastAPI app against a fake Ollama backend.
+
+Starts the fake Ollama (configurable token rate, latency distribution and
+failure rate) and `uvicorn app:app` in a throw-away workspace, seeds and
+ingests a synthetic subject, then drives an open-loop mix of uploads, ingest,
+MCQ, flashcard and validate calls at a target RPS. Latency is measured from
+each request's *scheduled* start, so a saturated server shows up as queueing
+delay instead of silently lowering the offered load.
+
+    python -m benchmarks.loadtest --rps 20 --duration 60 --workers 4
+    python -m benchmarks.loadtest --mix mcqs=5,flashcards=3,validate=2 --llm-latency-ms 800 --llm-tokens-per-s 40
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 --subject CS3491   # existing server
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.common import free_port, summarize, run_metadata, write_results, wait_for_http
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = "mcqs=40,flashcards=30,validate=20,upload=8,ingest=2"
+QUERIES = ["search algorithms", "bayesian networks", "neural networks", "decision trees",
+           "gradient descent", "clustering", "reinforcement learning", "regularization"]
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"mcqs", "flashcards", "validate", "upload", "ingest"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown routes in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test app:app with a fake Ollama")
+    parser.add_argument("--rps", type=float, default=10.0, help="target offered load (requests/s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds of traffic")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unmeasured traffic first")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--max-inflight", type=int, default=256, help="client-side connection cap")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--subject", default="CS3491")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--target", help="use an already running API at this URL instead of starting one")
+    parser.add_argument("--text-pages", type=int, default=20, help="synthetic pages seeded before the test")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-latency-dist", default="lognormal",
+                        choices=("fixed", "uniform", "exponential", "lognormal"))
+    parser.add_argument("--llm-tokens-per-s", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, help="results file (default: benchmarks/results/load-<ts>.json)")
+    parser.add_argument("--online", action="store_true", help="allow Hugging Face downloads in the server")
+    return parser.parse_args(argv)
+
+
+# ---- HTTP ----
+def multipart(fields: dict, file_field: str, filename: str, data: bytes) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: application/pdf\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, base_url: str, timeout: float):
+        url = urlsplit(base_url)
+        self.host, self.port, self.timeout = url.hostname, url.port or 80, timeout
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: bytes | None = None, headers: dict | None = None) -> int:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status
+        except Exception:
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+# ---- traffic ----
+class Traffic:
+    def __init__(self, client: Client, subject: str, upload_pdf: bytes, rng: random.Random):
+        self.client, self.subject, self.upload_pdf, self.rng = client, subject, upload_pdf, rng
+
+    def build(self, route: str) -> tuple:
+        """(method, path, body, headers) for one request; drawn on the scheduler thread."""
+        q = {"query": self.rng.choice(QUERIES)}
+        session = {"X-Session-Id": f"load-{self.rng.randrange(50)}"}
+        if route == "mcqs":
+            return "POST", f"/generate/mcqs/{self.subject}?{urlencode(q)}", None, session
+        if route == "flashcards":
+            return "POST", f"/generate/flashcards/{self.subject}?{urlencode({**q, 'num_cards': 8})}", None, session
+        if route == "validate":
+            return "POST", f"/validate/query/{self.subject}?{urlencode(q)}", None, {}
+        if route == "ingest":
+            return "POST", f"/ingest/{self.subject}", None, {}
+        body, ctype = multipart({"category": "notes"}, "file", f"load-{self.rng.randrange(1000)}.pdf", self.upload_pdf)
+        return "POST", f"/upload/{self.subject}", body, {"Content-Type": ctype}
+
+
+def run_traffic(args, traffic: Traffic, seconds: float, record: bool, results: dict):
+    routes, weights = zip(*args.mix.items())
+    rng = random.Random(args.seed + int(record))
+    lock = threading.Lock()
+    pool = ThreadPoolExecutor(max_workers=args.max_inflight)
+
+    def fire(route, scheduled, request):
+        try:
+            status = traffic.client.request(*request)
+        except Exception as e:
+            status = f"error:{type(e).__name__}"
+        latency = time.perf_counter() - scheduled
+        if record:
+            with lock:
+                results[route].append((latency, status))
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < seconds:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        route = rng.choices(routes, weights)[0]
+        pool.submit(fire, route, next_at, traffic.build(route))
+        next_at += rng.expovariate(args.rps) if args.arrival == "poisson" else 1 / args.rps
+    pool.shutdown(wait=True)
+    return time.perf_counter() - start
+
+
+def report(results: dict, elapsed: float) -> dict:
+    out, total, errors, all_latencies = {}, 0, 0, []
+    for route, samples in sorted(results.items()):
+        latencies = [lat for lat, status in samples]
+        failed = [s for _, s in samples if not (isinstance(s, int) and s < 400)]
+        statuses = defaultdict(int)
+        for _, s in samples:
+            statuses[str(s)] += 1
+        out[route] = {**summarize(latencies), "throughput_rps": round(len(samples) / elapsed, 3),
+                      "error_rate": round(len(failed) / len(samples), 4) if samples else 0.0,
+                      "statuses": dict(statuses)}
+        total += len(samples)
+        errors += len(failed)
+        all_latencies += latencies
+    out["all"] = {**summarize(all_latencies), "throughput_rps": round(total / elapsed, 3),
+                  "error_rate": round(errors / total, 4) if total else 0.0}
+    return out
+
+
+def print_table(routes: dict):
+    print(f"\n{'route':<12}{'n':>7}{'rps':>9}{'err%':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for route, r in routes.items():
+        print(f"{route:<12}{r['n']:>7}{r['throughput_rps']:>9.2f}{r['error_rate'] * 100:>8.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+# ---- environment ----
+def start_stack(args, workdir: Path) -> tuple:
+    """Start fake Ollama + uvicorn in an isolated workspace; return (base_url, cleanup callables, fake)."""
+    env = dict(os.environ, DATA_DIR=str(workdir / "data"), CHROMA_DIR=str(workdir / "chroma_db"),
+               ANONYMIZED_TELEMETRY="False")
+    if not args.online:
+        env.setdefault("HF_HUB_OFFLINE", "1")
+        env.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    from benchmarks import fake_ollama
+    server, fake = fake_ollama.start(latency_ms=args.llm_latency_ms, latency_dist=args.llm_latency_dist,
+                                     tokens_per_s=args.llm_tokens_per_s, failure_rate=args.llm_failure_rate,
+                                     seed=args.seed)
+    env["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from benchmarks.synth import build_subject
+    build_subject(workdir / "data", args.subject, args.text_pages)
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    cleanup = [server.shutdown, proc.terminate, lambda: proc.wait(timeout=30)]
+    if not wait_for_http(f"{base_url}/livez", timeout=120):
+        for fn in cleanup:
+            fn()
+        raise RuntimeError("API did not start")
+    return base_url, cleanup, fake
+
+
+def wait_ready(base_url: str, timeout: float = 300) -> dict:
+    deadline = time.monotonic() + timeout
+    client = Client(base_url, 10)
+    while time.monotonic() < deadline:
+        try:
+            if client.request("GET", "/readyz") == 200:
+                break
+        except Exception:
+            pass
+        time.sleep(0.5)
+    conn = http.client.HTTPConnection(urlsplit(base_url).hostname, urlsplit(base_url).port, timeout=10)
+    conn.request("GET", "/readyz")
+    return json.loads(conn.getresponse().read() or b"{}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = Path(tempfile.mkdtemp(prefix="tutor-load-"))
+    cleanup, fake = [], None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            print("🚀 starting fake Ollama + API ...")
+            base_url, cleanup, fake = start_stack(args, workdir)
+        readiness = wait_ready(base_url)
+        client = Client(base_url, args.timeout)
+
+        if not args.target:
+            t0 = time.perf_counter()
+            status = client.request("POST", f"/ingest/{args.subject}")
+            print(f"📥 seed ingest -> {status} in {time.perf_counter() - t0:.1f}s")
+
+        from benchmarks.synth import write_text_pdf, page_lines
+        upload_path = workdir / "upload.pdf"
+        write_text_pdf(upload_path, [page_lines(random.Random(args.seed), "Upload")])
+        traffic = Traffic(client, args.subject, upload_path.read_bytes(), random.Random(args.seed))
+
+        if args.warmup:
+            print(f"🔥 warm-up traffic for {args.warmup:.0f}s ...")
+            run_traffic(args, traffic, args.warmup, False, defaultdict(list))
+        print(f"📈 {args.rps} rps for {args.duration:.0f}s, mix={args.mix}")
+        samples = defaultdict(list)
+        elapsed = run_traffic(args, traffic, args.duration, True, samples)
+
+        routes = report(samples, elapsed)
+        print_table(routes)
+        results = {"meta": run_metadata(args), "target_rps": args.rps, "elapsed_seconds": round(elapsed, 3),
+                   "routes": routes, "readiness": readiness}
+        if fake is not None:
+            results["fake_llm"] = {"requests": fake.requests, "injected_failures": fake.failures}
+        write_results(results, args.out, "load")
+        return results
+    finally:
+        for fn in cleanup:
+            try:
+                fn()
+            except Exception:
+                pass
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
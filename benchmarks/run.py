@@ -0,0 +1,242 @@
+# benchmarks/run.py
+"""
+Offline benchmark suite: ingest, embedding, retrieval and end-to-end generation.
+
+Runs against a throw-away workspace of synthetic PDFs and a deterministic fake
+Ollama, so it needs no network (the embedding model must already be in the
+local Hugging Face cache) and gives comparable numbers between runs:
+
+    python -m benchmarks.run                       # default sizes
+    python -m benchmarks.run --quick               # smoke run
+    python -m benchmarks.compare old.json new.json # regression check
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_SUBJECT = "BENCH"
+SOURCES = ["notes", "syllabus"]
+WORKDIR_MARKER = ".tutor-bench-workdir"   # written into every workspace; only marked dirs are ever cleared
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks")
+    parser.add_argument("--text-pages", type=int, default=40, help="text pages in the ingest corpus")
+    parser.add_argument("--scanned-pages", type=int, default=4, help="image-only pages (OCR) in the ingest corpus")
+    parser.add_argument("--embed-chunks", type=int, default=512, help="chunks for the embedding throughput run")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[500, 2000, 8000],
+                        help="comma-separated subject sizes (chunks) for the retrieval scan")
+    parser.add_argument("--queries", type=int, default=100, help="queries per retrieval size")
+    parser.add_argument("--generate-requests", type=int, default=30, help="end-to-end generate calls")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="fake Ollama delay per call")
+    parser.add_argument("--replay", type=Path, help="recorded LLM outputs for the fake Ollama")
+    parser.add_argument("--workdir", type=Path, help="keep the workspace here instead of a temp dir "
+                        "(must be new, empty or a previous benchmark workspace)")
+    parser.add_argument("--out", type=Path, help="results file (default: benchmarks/results/bench-<ts>.json)")
+    parser.add_argument("--online", action="store_true", help="allow Hugging Face downloads")
+    parser.add_argument("--quick", action="store_true", help="tiny sizes for a smoke run")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.text_pages, args.scanned_pages, args.embed_chunks = 5, 1, 64
+        args.sizes, args.queries, args.generate_requests = [200, 800], 20, 5
+    return args
+
+
+def setup_environment(args) -> Path:
+    """Point the project at an isolated workspace; must run before importing project modules."""
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="tutor-bench-"))
+    if args.workdir and workdir.exists() and (not workdir.is_dir() or any(workdir.iterdir())):
+        # Only ever clear a workspace a previous benchmark run created (never e.g. `--workdir .`)
+        if not (workdir / WORKDIR_MARKER).exists():
+            raise SystemExit(f"❌ {workdir} is not empty and is not a benchmark workspace; "
+                             "pass a new or empty directory")
+        shutil.rmtree(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    (workdir / WORKDIR_MARKER).touch()
+    os.environ["DATA_DIR"] = str(workdir / "data")
+    os.environ["CHROMA_DIR"] = str(workdir / "chroma_db")
+    if not args.online:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")   # chroma telemetry
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    return workdir
+
+
+def ocr_available() -> bool:
+    return bool(shutil.which("tesseract") and shutil.which("pdftoppm"))
+
+
+def stage_delta(before: dict, stage: str) -> float:
+    from metrics import STAGE_SECONDS
+    return STAGE_SECONDS.snapshot(stage=stage)[1] - before.get(stage, 0.0)
+
+
+def stage_sums(*stages) -> dict:
+    from metrics import STAGE_SECONDS
+    return {s: STAGE_SECONDS.snapshot(stage=s)[1] for s in stages}
+
+
+def bench_ingest(args) -> dict:
+    from config import DATA_DIR
+    from ingest import ingest_all
+    from metrics import PAGES_EXTRACTED, PAGES_OCR, CHUNKS_INGESTED
+    from benchmarks.synth import build_subject
+
+    scanned = args.scanned_pages if ocr_available() else 0
+    if args.scanned_pages and not scanned:
+        print("⚠️ tesseract/poppler not found: skipping scanned pages (OCR share not measured)")
+    counts = build_subject(DATA_DIR, BENCH_SUBJECT, args.text_pages, scanned)
+
+    before = stage_sums("ingest.ocr_page", "ingest.extract_page", "ingest.embed_store")
+    t0 = time.perf_counter()
+    ingest_all(BENCH_SUBJECT)
+    seconds = time.perf_counter() - t0
+
+    pages = PAGES_EXTRACTED.value(subject=BENCH_SUBJECT)
+    ocr_seconds = stage_delta(before, "ingest.ocr_page")
+    return {
+        "pages": pages,
+        "ocr_pages": PAGES_OCR.value(subject=BENCH_SUBJECT),
+        "chunks": CHUNKS_INGESTED.value(subject=BENCH_SUBJECT),
+        "corpus": counts,
+        "ocr_available": scanned > 0,
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(pages / seconds, 3) if seconds else 0.0,
+        "extract_seconds": round(stage_delta(before, "ingest.extract_page"), 3),
+        "ocr_seconds": round(ocr_seconds, 3),
+        "ocr_share": round(ocr_seconds / seconds, 3) if seconds else 0.0,
+        "embed_store_seconds": round(stage_delta(before, "ingest.embed_store"), 3),
+    }
+
+
+def bench_embedding(args) -> tuple[dict, list]:
+    from retriever import get_embeddings
+    from benchmarks.common import summarize
+    from benchmarks.synth import synthetic_chunks, synthetic_queries
+
+    embeddings = get_embeddings()
+    corpus = synthetic_chunks(max(args.embed_chunks, max(args.sizes)))
+    texts = [text for text, _ in corpus[:args.embed_chunks]]
+    t0 = time.perf_counter()
+    embeddings.embed_documents(texts)
+    seconds = time.perf_counter() - t0
+
+    query_times = []
+    for q in synthetic_queries(args.queries):
+        t = time.perf_counter()
+        embeddings.embed_query(q)
+        query_times.append(time.perf_counter() - t)
+    return {
+        "chunks": len(texts),
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(len(texts) / seconds, 3) if seconds else 0.0,
+        "query_embed": summarize(query_times),
+    }, corpus
+
+
+def bench_retrieval(args, corpus: list) -> dict:
+    from retriever import get_embeddings, load_db, get_context_scoped
+    from benchmarks.common import summarize
+    from benchmarks.synth import synthetic_queries
+
+    # Embed the largest corpus once and reuse prefixes of it for each size
+    largest = max(args.sizes)
+    texts = [text for text, _ in corpus[:largest]]
+    vectors = get_embeddings().embed_documents(texts)
+    queries = synthetic_queries(args.queries)
+    out = {}
+    for size in sorted(args.sizes):
+        subject = f"RET{size}"
+        db = load_db(subject)
+        for start in range(0, size, 4000):   # stay under chroma's max batch size
+            end = min(size, start + 4000)
+            db._collection.add(
+                ids=[f"c{i}" for i in range(start, end)],
+                embeddings=vectors[start:end],
+                documents=texts[start:end],
+                metadatas=[{"source_type": corpus[i][1], "chunk_index": i} for i in range(start, end)],
+            )
+        get_context_scoped(queries[0], subject, k=8, sources=SOURCES)   # warm the index
+        before = stage_sums("retrieval.search", "retrieval.embed_query")
+        latencies = []
+        for q in queries:
+            t0 = time.perf_counter()
+            get_context_scoped(q, subject, k=8, sources=SOURCES)
+            latencies.append(time.perf_counter() - t0)
+        out[str(size)] = {
+            "total": summarize(latencies),
+            "search_mean_ms": round(stage_delta(before, "retrieval.search") / len(queries) * 1000, 3),
+            "embed_query_mean_ms": round(stage_delta(before, "retrieval.embed_query") / len(queries) * 1000, 3),
+        }
+        print(f"🔎 retrieval @ {size} chunks: p50={out[str(size)]['total']['p50_ms']}ms "
+              f"p99={out[str(size)]['total']['p99_ms']}ms")
+    return out
+
+
+def bench_generate(args) -> dict:
+    from retriever import get_context_scoped
+    from mcq_generator import generate_mcqs
+    from flashcard_generator import generate_flashcards
+    from metrics import JSON_PARSE_FAILURES
+    from benchmarks.common import summarize
+    from benchmarks.synth import synthetic_queries
+
+    results = {}
+    for kind in ("mcqs", "flashcards"):
+        latencies, items = [], 0
+        for q in synthetic_queries(args.generate_requests, seed=11):
+            t0 = time.perf_counter()
+            context = get_context_scoped(q, BENCH_SUBJECT, k=8, sources=SOURCES)
+            if kind == "mcqs":
+                out = generate_mcqs({"subject_code": BENCH_SUBJECT}, context)
+            else:
+                out = generate_flashcards({"subject_code": BENCH_SUBJECT}, context, 8)
+            latencies.append(time.perf_counter() - t0)
+            items += len(out)
+        results[kind] = {**summarize(latencies), "items": items,
+                         "json_failures": JSON_PARSE_FAILURES.value(generator=kind[:-1])}
+    return results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = setup_environment(args)
+
+    from benchmarks.common import free_port, run_metadata, write_results
+    port = free_port()
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{port}"
+    from benchmarks import fake_ollama
+    server, fake = fake_ollama.start(port, latency_ms=args.llm_latency_ms, replay=args.replay)
+
+    from retriever import get_embeddings
+    t0 = time.perf_counter()
+    get_embeddings().embed_query("warm up")
+    model_load = time.perf_counter() - t0
+
+    results = {"meta": run_metadata(args), "embedding_model_load_seconds": round(model_load, 3)}
+    print("📥 ingest ...")
+    results["ingest"] = bench_ingest(args)
+    print("🧮 embedding ...")
+    results["embedding"], corpus = bench_embedding(args)
+    print("🔎 retrieval ...")
+    results["retrieval"] = bench_retrieval(args, corpus)
+    print("🤖 generate ...")
+    results["generate"] = bench_generate(args)
+    results["fake_llm_requests"] = fake.requests
+
+    server.shutdown()
+    write_results(results, args.out, "bench")
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
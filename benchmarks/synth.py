@@ -0,0 +1,152 @@
+# benchmarks/synth.py
+"""
+Deterministic synthetic course material for benchmarks.
+
+- Text PDFs are written by hand (Helvetica, no dependencies) so pypdf extracts
+  real text from them.
+- Scanned-style PDFs are pages rendered to images with Pillow (a dependency
+  of pdf2image) so ingest has to fall back to OCR for every page.
+"""
+import random
+from pathlib import Path
+
+TERMS = [
+    "search algorithms", "heuristic search", "constraint satisfaction", "game playing",
+    "bayesian networks", "probabilistic reasoning", "exact inference", "markov models",
+    "linear regression", "logistic regression", "decision trees", "random forests",
+    "support vector machines", "k nearest neighbours", "naive bayes", "clustering",
+    "k means", "gaussian mixture models", "expectation maximization", "dimensionality reduction",
+    "principal component analysis", "neural networks", "perceptron", "backpropagation",
+    "gradient descent", "regularization", "overfitting", "cross validation",
+    "ensemble learning", "bagging", "boosting", "reinforcement learning",
+]
+FILLER = (
+    "the model is trained on labelled examples and evaluated on held out data "
+    "each step updates the parameters to reduce the loss on the training set "
+    "students should compare the assumptions behind every method before applying it "
+    "a worked example shows how the algorithm behaves on a small dataset"
+).split()
+# Pseudo-words keep pages lexically diverse, otherwise ingest's junk detector
+# (unique-word ratio) would send every synthetic page to OCR.
+_SYLLABLES = ["ka", "lo", "mi", "ren", "tas", "vor", "quel", "sin", "dra", "pho", "ex", "lum", "ter", "zai"]
+_vocab_rng = random.Random(0)
+VOCAB = sorted({"".join(_vocab_rng.choice(_SYLLABLES) for _ in range(_vocab_rng.randint(2, 4)))
+                for _ in range(5000)})
+LINES_PER_PAGE = 40
+CHARS_PER_LINE = 90
+
+
+def paragraph(rng: random.Random, words: int = 60) -> str:
+    out = []
+    for _ in range(words):
+        roll = rng.random()
+        out.append(rng.choice(TERMS) if roll < 0.15 else rng.choice(FILLER) if roll < 0.4 else rng.choice(VOCAB))
+    return " ".join(out).capitalize() + "."
+
+
+def page_lines(rng: random.Random, heading: str) -> list[str]:
+    lines = [heading]
+    while len(lines) < LINES_PER_PAGE:
+        text = paragraph(rng)
+        while text and len(lines) < LINES_PER_PAGE:
+            cut = text.rfind(" ", 0, CHARS_PER_LINE) if len(text) > CHARS_PER_LINE else len(text)
+            lines.append(text[:cut])
+            text = text[cut:].strip()
+    return lines
+
+
+def syllabus_lines(units: int = 5) -> list[str]:
+    lines, per_unit = [], max(1, len(TERMS) // units)
+    for u in range(units):
+        topics = TERMS[u * per_unit:(u + 1) * per_unit]
+        lines.append(f"UNIT {'I' * (u + 1) if u < 3 else ['IV', 'V'][u - 3]} {topics[0].upper()} 9")
+        lines.append(" - ".join(t.capitalize() for t in topics))
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: Path, pages: list[list[str]]):
+    """Write a minimal multi-page PDF with one text line per row."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in lines:
+            body.append(f"({_pdf_escape(line)}) Tj T*")
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream.decode('latin-1')}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(out))
+
+
+def write_scanned_pdf(path: Path, pages: list[list[str]], dpi: int = 150):
+    """Render pages to grayscale images and save them as an image-only PDF."""
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        font = ImageFont.load_default(size=22)
+    except TypeError:   # Pillow < 10.1 has only the small bitmap font
+        font = ImageFont.load_default()
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    images = []
+    for lines in pages:
+        img = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(img)
+        y = 60
+        for line in lines:
+            draw.text((60, y), line, fill=0, font=font)
+            y += 30
+            if y > height - 60:
+                break
+        images.append(img)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+
+
+def build_subject(data_dir: Path, subject_code: str, text_pages: int = 20,
+                  scanned_pages: int = 0, seed: int = 1234) -> dict:
+    """Create syllabus/notes/past_papers PDFs for one subject; return page counts."""
+    rng = random.Random(seed)
+    root = data_dir / subject_code
+    write_text_pdf(root / "syllabus" / "syllabus.pdf", [syllabus_lines()])
+    notes = [page_lines(rng, f"Lecture {i + 1}: {rng.choice(TERMS).title()}") for i in range(text_pages)]
+    write_text_pdf(root / "notes" / "notes.pdf", notes)
+    paper = [page_lines(rng, f"Question {i + 1}") for i in range(max(1, text_pages // 10))]
+    write_text_pdf(root / "past_papers" / "paper.pdf", paper)
+    if scanned_pages:
+        scanned = [page_lines(rng, f"Scanned handout {i + 1}") for i in range(scanned_pages)]
+        write_scanned_pdf(root / "notes" / "scanned.pdf", scanned)
+    return {"syllabus": 1, "notes": text_pages + scanned_pages, "past_papers": len(paper),
+            "scanned": scanned_pages}
+
+
+def synthetic_chunks(n: int, seed: int = 99) -> list[tuple[str, str]]:
+    """n (text, source_type) pairs for retrieval benchmarks without going through PDFs."""
+    rng = random.Random(seed)
+    kinds = ["notes"] * 6 + ["syllabus"] + ["past_papers"] * 3
+    return [(paragraph(rng, 150), rng.choice(kinds)) for _ in range(n)]
+
+
+def synthetic_queries(n: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    return [f"{rng.choice(TERMS)} and {rng.choice(TERMS)}" for _ in range(n)]
@@ -0,0 +1,217 @@
+# benchmarks/vector_backends.py
+"""
+Chroma vs the memory-mapped flat index (float16 and int8) on the same vectors.
+
+For every subject size each backend is opened in a fresh subprocess, so the
+numbers include a real cold start (open + first query) and a clean RSS delta:
+
+    python -m benchmarks.vector_backends --quick
+    python -m benchmarks.vector_backends --sizes 1000,5000,20000 --queries 200
+    python -m benchmarks.vector_backends --random-vectors    # no embedding model needed
+
+Recall@k is measured against exact float32 search with the same source filter
+the app uses (notes + syllabus).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SOURCES = ["notes", "syllabus"]
+BACKENDS = ("chroma", "flat-float16", "flat-int8")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chroma vs flat index: latency, memory, recall")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[500, 2000, 8000],
+                        help="comma-separated subject sizes (chunks)")
+    parser.add_argument("--queries", type=int, default=100, help="queries per size")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--backends", type=lambda s: s.split(","), default=list(BACKENDS))
+    parser.add_argument("--random-vectors", action="store_true",
+                        help="random unit vectors instead of embedding synthetic chunks")
+    parser.add_argument("--dim", type=int, default=384, help="dimension for --random-vectors")
+    parser.add_argument("--workdir", type=Path, help="keep the workspace here instead of a temp dir "
+                        "(must be new, empty or a previous benchmark workspace)")
+    parser.add_argument("--out", type=Path, help="results file (default: benchmarks/results/vectors-<ts>.json)")
+    parser.add_argument("--online", action="store_true", help="allow Hugging Face downloads")
+    parser.add_argument("--quick", action="store_true", help="tiny sizes for a smoke run")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.sizes, args.queries = [200, 1000], 20
+    return args
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux); falls back to peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+# ---- probe (runs in a subprocess) -------------------------------------------
+
+def probe(backend: str, path: Path, queries_file: Path, k: int) -> dict:
+    import numpy as np
+    queries = np.load(queries_file)
+    rss_start = rss_bytes()
+
+    t0 = time.perf_counter()
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        db = Chroma(persist_directory=str(path))
+
+        def search(q):
+            results = db.similarity_search_by_vector(q.tolist(), k=20)   # same as retriever
+            hits = [r for r in results if r.metadata.get("source_type") in SOURCES] or results
+            return [r.metadata["chunk_index"] for r in hits[:k]]
+    else:
+        from flat_index import FlatIndex
+        db = FlatIndex(path)
+
+        def search(q):
+            return [int(db.meta["chunk_index"][i]) for i in db.search(q, k, source_types=SOURCES)]
+    open_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = [search(queries[0])]
+    first_query_s = time.perf_counter() - t0
+    rss_open = rss_bytes()
+
+    latencies = []
+    for q in queries[1:]:
+        t = time.perf_counter()
+        results.append(search(q))
+        latencies.append(time.perf_counter() - t)
+    return {"open_s": open_s, "first_query_s": first_query_s, "latencies": latencies,
+            "rss_open_bytes": rss_open - rss_start, "rss_end_bytes": rss_bytes() - rss_start,
+            "results": results}
+
+
+# ---- driver -----------------------------------------------------------------
+
+def load_vectors(args, n: int):
+    import numpy as np
+    from benchmarks.synth import synthetic_chunks, synthetic_queries
+    corpus = synthetic_chunks(n)
+    query_texts = synthetic_queries(args.queries)
+    if args.random_vectors:
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((n, args.dim)).astype(np.float32)
+        queries = rng.standard_normal((len(query_texts), args.dim)).astype(np.float32)
+    else:
+        from retriever import get_embeddings
+        embeddings = get_embeddings()
+        vectors = np.asarray(embeddings.embed_documents([t for t, _ in corpus]), dtype=np.float32)
+        queries = np.asarray([embeddings.embed_query(q) for q in query_texts], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return corpus, vectors, queries
+
+
+def build_stores(workdir: Path, size: int, corpus, vectors, backends) -> dict:
+    import flat_index
+    texts = [t for t, _ in corpus[:size]]
+    metas = [{"source_type": corpus[i][1], "source": "synthetic.pdf", "chunk_index": i} for i in range(size)]
+    paths = {}
+    for backend in backends:
+        path = workdir / backend / str(size)
+        if backend == "chroma":
+            from langchain_chroma import Chroma
+            db = Chroma(persist_directory=str(path))
+            for start in range(0, size, 4000):   # stay under chroma's max batch size
+                end = min(size, start + 4000)
+                db._collection.add(ids=[f"c{i}" for i in range(start, end)],
+                                   embeddings=vectors[start:end].tolist(),
+                                   documents=texts[start:end], metadatas=metas[start:end])
+            del db
+        else:
+            flat_index.build(path, texts, vectors[:size], metas, dtype=backend.split("-", 1)[1])
+        paths[backend] = path
+    return paths
+
+
+def exact_topk(vectors, queries, corpus, size: int, k: int) -> list[list[int]]:
+    import numpy as np
+    mask = np.array([corpus[i][1] in SOURCES for i in range(size)])
+    scores = queries @ vectors[:size].T
+    scores[:, ~mask] = -np.inf
+    return [np.argsort(-row, kind="stable")[:k].tolist() for row in scores]
+
+
+def recall(found: list[list[int]], truth: list[list[int]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return round(hits / max(1, sum(len(t) for t in truth)), 4)
+
+
+def run_probe(backend: str, path: Path, queries_file: Path, k: int) -> dict:
+    cmd = [sys.executable, "-m", "benchmarks.vector_backends", "--probe", backend, str(path),
+           "--queries-file", str(queries_file), "--k", str(k)]
+    out = subprocess.run(cmd, cwd=REPO_ROOT, capture_output=True, text=True, env=os.environ.copy())
+    if out.returncode != 0:
+        raise RuntimeError(f"{backend} probe failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--probe" in argv:   # subprocess mode, see run_probe()
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--probe", nargs=2, metavar=("BACKEND", "PATH"))
+        parser.add_argument("--queries-file", type=Path)
+        parser.add_argument("--k", type=int)
+        args = parser.parse_args(argv)
+        print(json.dumps(probe(args.probe[0], Path(args.probe[1]), args.queries_file, args.k)))
+        return
+
+    import shutil
+    import numpy as np
+    from benchmarks.run import setup_environment
+    args = parse_args(argv)
+    workdir = setup_environment(args)
+    from benchmarks.common import summarize, run_metadata, write_results
+
+    corpus, vectors, queries = load_vectors(args, max(args.sizes))
+    queries_file = workdir / "queries.npy"
+    np.save(queries_file, queries)
+
+    results = {"meta": run_metadata(args), "dim": int(vectors.shape[1]), "sizes": {}}
+    for size in sorted(args.sizes):
+        paths = build_stores(workdir, size, corpus, vectors, args.backends)
+        truth = exact_topk(vectors, queries, corpus, size, args.k)
+        row = {}
+        for backend, path in paths.items():
+            r = run_probe(backend, path, queries_file, args.k)
+            row[backend] = {
+                "cold_start_ms": round((r["open_s"] + r["first_query_s"]) * 1000, 3),
+                "open_ms": round(r["open_s"] * 1000, 3),
+                "search": summarize(r["latencies"]),
+                "recall_at_k": recall(r["results"], truth),
+                "rss_delta_mb": round(r["rss_end_bytes"] / 2**20, 2),
+                "disk_mb": round(dir_size(path) / 2**20, 2),
+            }
+            print(f"🔎 {backend:13} @ {size:6} chunks: cold={row[backend]['cold_start_ms']}ms "
+                  f"p50={row[backend]['search']['p50_ms']}ms p99={row[backend]['search']['p99_ms']}ms "
+                  f"recall@{args.k}={row[backend]['recall_at_k']} rss=+{row[backend]['rss_delta_mb']}MB")
+        results["sizes"][str(size)] = row
+
+    write_results(results, args.out, "vectors")
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -4,25 +4,92 @@ from pathlib import Path
 
 # Paths
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR        = BASE_DIR / "data"
-CHROMA_DIR      = BASE_DIR / "chroma_db"
+DATA_DIR        = Path(os.getenv("DATA_DIR", BASE_DIR / "data"))
+CHROMA_DIR      = Path(os.getenv("CHROMA_DIR", BASE_DIR / "chroma_db"))
 SYLLABUS_DIR    = DATA_DIR / "syllabus"
 NOTES_DIR       = DATA_DIR / "notes"
 PAST_PAPERS_DIR = DATA_DIR / "past_papers"
 
 
-# Poppler (Windows)
-POPPLER_PATH    = r"C:\Program Files\poppler\Library\bin"
+# Poppler (Windows default; elsewhere found on PATH)
+POPPLER_PATH    = os.getenv("POPPLER_PATH", r"C:\Program Files\poppler\Library\bin" if os.name == "nt" else None)
 
-# Tesseract (Windows)
-TESSERACT_PATH  = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Tesseract (Windows default; elsewhere found on PATH)
+TESSERACT_PATH  = os.getenv("TESSERACT_PATH", r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else None)
 
 # Chunk settings
 CHUNK_SIZE      = 1000
 CHUNK_OVERLAP   = 200
 
 # Embedding model
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Subject registry (ingest state, sizes, last access) and the cache of open subject indexes
+SUBJECT_REGISTRY_PATH   = Path(os.getenv("SUBJECT_REGISTRY", CHROMA_DIR / "registry.sqlite3"))
+DEFAULT_SUBJECTS        = ["CS3491", "MA3251"]   # seeded into a new registry
+SUBJECT_IDLE_SECONDS    = 1800              # close a subject's index after this long without queries
+SUBJECT_CACHE_MAX_BYTES = 2 * 1024 ** 3     # soft cap on the summed index size of open subjects
+SUBJECT_EVICT_GRACE     = 30                # never close an index used within this many seconds
+WARMUP_MAX_SUBJECTS     = 4                 # most recently used subjects opened at startup
+
+# Shared embedding sidecar (python embedding_service.py). When set, every worker embeds
+# through this Unix socket instead of loading its own copy of the model.
+EMBEDDING_SOCKET      = os.getenv("EMBEDDING_SOCKET")   # e.g. /tmp/tutor-embed.sock
+EMBED_BATCH_WINDOW_MS = 5      # sidecar waits this long to group concurrent query embeddings
+EMBED_MAX_BATCH       = 64     # max query texts per forward pass
+
+# Vector store backend: "chroma" (HNSW), "flat" (memory-mapped NumPy matrix, exact search)
+# or "auto" (flat for subjects up to FLAT_INDEX_MAX_CHUNKS chunks, Chroma above that)
+VECTOR_BACKEND        = os.getenv("VECTOR_BACKEND", "chroma")
+FLAT_INDEX_MAX_CHUNKS = 20000
+FLAT_INDEX_DTYPE      = os.getenv("FLAT_INDEX_DTYPE", "float16")   # float16 | int8 (per-row scaled)
+
+# HNSW auto-tuning (python tune_index.py <SUBJECT>); results are stored per subject in index_params.json
+HNSW_TARGET_RECALL    = 0.95    # recall@k against exact search the tuned index must reach
+HNSW_TUNE_QUERIES     = 200     # held-out chunks used as queries
+HNSW_TUNE_SAMPLE      = 20000   # max chunks in each trial index
+HNSW_TUNE_GRID        = {
+    "hnsw:M": [8, 16, 32],
+    "hnsw:construction_ef": [100, 200],
+    "hnsw:search_ef": [10, 20, 40, 80, 160],
+}
 
 # Ollama LLM model
-OLLAMA_MODEL    = "llama3.1:8b"
\ No newline at end of file
+OLLAMA_MODEL    = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+OLLAMA_HOST     = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+OLLAMA_KEEP_ALIVE = "30m"   # how long Ollama keeps the model loaded after a call
+OLLAMA_TIMEOUT  = 300       # seconds per generation request
+
+# Predictive prefetch (next syllabus topics for an active session)
+PREFETCH_ENABLED        = True
+PREFETCH_AHEAD          = 2      # topics to prefetch after the current one
+PREFETCH_SESSION_BUDGET = 6      # max prefetch jobs issued per session
+PREFETCH_MAX_PENDING    = 8      # max queued prefetch jobs across all sessions
+PREFETCH_BUSY_THRESHOLD = 2      # foreground requests in flight before prefetch backs off
+PREFETCH_MIN_TOPIC_SCORE = 0.5   # word overlap (Jaccard) a query needs to be served a topic's prefetched set
+SESSION_TTL_SECONDS     = 3600
+
+# Generated-result cache shared by API requests and prefetch
+RESULT_CACHE_SIZE       = 256
+RESULT_CACHE_TTL        = 1800   # seconds
+
+# Request path: bounded executors for blocking work
+EMBED_WORKERS           = 4      # embedding + similarity search
+LLM_WORKERS             = 2      # concurrent Ollama generations
+INGEST_WORKERS          = 1      # PDF extraction / OCR / indexing
+EXECUTOR_QUEUE_LIMIT    = 16     # queued jobs per executor before answering 503
+
+# Uploads
+MAX_UPLOAD_BYTES        = 50 * 1024 * 1024   # reject larger PDFs with 413
+
+# HTTP caching / compression (ETags from ingest generation + body hash)
+COMPRESS_MIN_BYTES      = 1024   # gzip/brotli JSON and HTML bodies at least this large
+GENERATE_CACHE_MAX_AGE  = 300    # seconds a client may reuse a generated set without revalidating
+
+# Startup warm-up
+WARMUP_ON_STARTUP       = True   # preload embeddings, open Chroma DBs, load the Ollama model
+
+# Profiling: requests slower than this are dumped (stages + request id) to PROFILE_LOG.
+# None disables the dump; clients can always ask for timings with an `X-Profile: 1` header.
+PROFILE_SLOW_REQUEST_MS = None
+PROFILE_LOG             = BASE_DIR / "profiles" / "slow_requests.jsonl"
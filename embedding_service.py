@@ -0,0 +1,282 @@
+# embedding_service.py
+"""
+Embedding sidecar: one copy of the sentence-transformers model shared by every
+API worker over a Unix socket.
+
+    python embedding_service.py --socket /tmp/tutor-embed.sock
+    EMBEDDING_SOCKET=/tmp/tutor-embed.sock gunicorn app:app -w 4 -k uvicorn.workers.UvicornWorker
+
+Concurrent query embeddings from different workers/requests are grouped into a
+single forward pass (dynamic micro-batching): the first query opens a window of
+EMBED_BATCH_WINDOW_MS and everything arriving within it, up to EMBED_MAX_BATCH
+texts, is embedded together. Document batches (ingest) run on their own and are
+sent in slices by the client, so queries can interleave with a long ingest.
+
+Wire format: every message is a 4-byte big-endian length followed by the
+payload. Requests are JSON ({"op": "query" | "documents" | "stats", "texts": [...]});
+a successful embed reply is a JSON header ({"ok": true, "shape": [n, dim]})
+followed by one frame of little-endian float32 values.
+"""
+import argparse
+import collections
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from config import EMBEDDING_SOCKET, EMBED_BATCH_WINDOW_MS, EMBED_MAX_BATCH
+
+FRAME_HEADER = struct.Struct("!I")
+CLIENT_TIMEOUT = 120        # seconds to wait for one reply
+DOCUMENT_SLICE = 256        # texts per "documents" request sent by the client
+
+
+class EmbeddingServiceError(RuntimeError):
+    """The sidecar is unreachable or answered with an error."""
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes | None:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> bytes | None:
+    """Next frame, or None when the peer closed the connection."""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, FRAME_HEADER.unpack(header)[0])
+
+
+# ---- server -----------------------------------------------------------------
+
+class _Job:
+    __slots__ = ("kind", "texts", "future")
+
+    def __init__(self, kind: str, texts: list[str]):
+        self.kind, self.texts, self.future = kind, texts, Future()
+
+
+class MicroBatcher:
+    """Runs every forward pass on one thread, merging concurrent query jobs."""
+
+    def __init__(self, embeddings, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_MAX_BATCH):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._deferred = collections.deque()   # document jobs that arrived while a query batch was open
+        self._stats_lock = threading.Lock()
+        self.stats = {"query_batches": 0, "queries": 0, "max_query_batch": 0,
+                      "document_batches": 0, "documents": 0}
+        threading.Thread(target=self._loop, name="embed-batcher", daemon=True).start()
+
+    def submit(self, kind: str, texts: list[str]) -> Future:
+        job = _Job(kind, texts)
+        self._queue.put(job)
+        return job.future
+
+    def report(self) -> dict:
+        with self._stats_lock:
+            out = dict(self.stats)
+        out["mean_query_batch"] = round(out["queries"] / out["query_batches"], 3) if out["query_batches"] else 0.0
+        return out
+
+    def _loop(self):
+        while True:
+            job = self._deferred.popleft() if self._deferred else self._queue.get()
+            if job.kind == "documents":
+                self._run([job], "documents")
+                continue
+            batch, size = [job], len(job.texts)
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt.kind == "documents":
+                    self._deferred.append(nxt)
+                    continue
+                batch.append(nxt)
+                size += len(nxt.texts)
+            self._run(batch, "query")
+
+    def _queries_as_documents(self) -> bool:
+        """True when embed_query would encode exactly like embed_documents, so a whole query
+        batch can go through one embed_documents call. HuggingFaceEmbeddings only differs once
+        query_encode_kwargs is set (e.g. an e5/bge query prompt); other classes are not assumed to match."""
+        return getattr(self.embeddings, "query_encode_kwargs", None) == {}
+
+    def _run(self, batch: list[_Job], kind: str):
+        texts = [t for job in batch for t in job.texts]
+        try:
+            if kind == "query" and not self._queries_as_documents():
+                vectors = np.asarray([self.embeddings.embed_query(t) for t in texts], dtype="<f4")
+            else:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype="<f4")
+        except Exception as e:
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        start = 0
+        for job in batch:
+            job.future.set_result(vectors[start:start + len(job.texts)])
+            start += len(job.texts)
+        with self._stats_lock:
+            if kind == "query":
+                self.stats["query_batches"] += 1
+                self.stats["queries"] += len(texts)
+                self.stats["max_query_batch"] = max(self.stats["max_query_batch"], len(texts))
+            else:
+                self.stats["document_batches"] += 1
+                self.stats["documents"] += len(texts)
+
+
+def make_handler(batcher: MicroBatcher):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            sock = self.request
+            while True:
+                frame = recv_frame(sock)
+                if frame is None:
+                    return
+                try:
+                    req = json.loads(frame)
+                    if req.get("op") == "stats":
+                        send_frame(sock, json.dumps({"ok": True, "stats": batcher.report()}).encode())
+                        continue
+                    if req.get("op") not in ("query", "documents"):
+                        raise ValueError(f"unknown op {req.get('op')!r}")
+                    vectors = batcher.submit(req["op"], list(req["texts"])).result()
+                except Exception as e:
+                    send_frame(sock, json.dumps({"ok": False, "error": str(e)}).encode())
+                    continue
+                send_frame(sock, json.dumps({"ok": True, "shape": list(vectors.shape)}).encode())
+                send_frame(sock, vectors.tobytes())
+
+    return Handler
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128   # every worker thread opens its own connection
+
+
+def serve(socket_path: str, embeddings=None, window_ms: float = EMBED_BATCH_WINDOW_MS,
+          max_batch: int = EMBED_MAX_BATCH) -> EmbeddingServer:
+    """Bind the socket and start serving in a daemon thread; returns the server."""
+    if embeddings is None:
+        from retriever import load_local_embeddings
+        embeddings = load_local_embeddings()
+        embeddings.embed_documents(["warm up"])
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)   # stale socket from a previous run
+    batcher = MicroBatcher(embeddings, window_ms, max_batch)
+    server = EmbeddingServer(socket_path, make_handler(batcher))
+    server.batcher = batcher
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---- client -----------------------------------------------------------------
+
+class RemoteEmbeddings:
+    """Drop-in for HuggingFaceEmbeddings (embed_query / embed_documents) backed by the sidecar."""
+
+    def __init__(self, socket_path: str, timeout: float = CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()   # one connection per thread
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _roundtrip(self, payload: bytes) -> tuple[dict, bytes | None]:
+        sock = getattr(self._local, "sock", None) or self._connect()
+        send_frame(sock, payload)
+        header = recv_frame(sock)
+        if header is None:
+            raise ConnectionError("embedding service closed the connection")
+        reply = json.loads(header)
+        data = recv_frame(sock) if reply.get("shape") else None
+        return reply, data
+
+    def _request(self, op: str, texts: list[str] | None = None) -> tuple[dict, bytes | None]:
+        payload = json.dumps({"op": op, "texts": texts or []}).encode("utf-8")
+        for attempt in (1, 2):   # reconnect once, e.g. after a sidecar restart
+            try:
+                reply, data = self._roundtrip(payload)
+                break
+            except OSError as e:
+                self._close()
+                if attempt == 2:
+                    raise EmbeddingServiceError(f"embedding service at {self.socket_path} unavailable: {e}") from e
+        if not reply.get("ok"):
+            raise EmbeddingServiceError(reply.get("error", "unknown error"))
+        return reply, data
+
+    def _embed(self, op: str, texts: list[str]) -> list[list[float]]:
+        reply, data = self._request(op, texts)
+        return np.frombuffer(data, dtype="<f4").reshape(reply["shape"]).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed("query", [text])[0]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        out = []
+        for start in range(0, len(texts), DOCUMENT_SLICE):
+            out += self._embed("documents", texts[start:start + DOCUMENT_SLICE])
+        return out
+
+    def stats(self) -> dict:
+        return self._request("stats")[0]["stats"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared embedding sidecar (Unix socket, micro-batching)")
+    parser.add_argument("--socket", default=EMBEDDING_SOCKET or "/tmp/tutor-embed.sock")
+    parser.add_argument("--window-ms", type=float, default=EMBED_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=EMBED_MAX_BATCH)
+    args = parser.parse_args()
+    server = serve(args.socket, window_ms=args.window_ms, max_batch=args.max_batch)
+    print(f"🧮 Embedding service listening on {args.socket} "
+          f"(window {args.window_ms}ms, max batch {args.max_batch})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
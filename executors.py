@@ -0,0 +1,54 @@
+# executors.py
+"""
+Dedicated, bounded thread pools for the blocking parts of a request.
+
+Embedding/retrieval, LLM calls and ingestion each get their own pool so a burst
+of one kind of work cannot starve the others (or the event loop). Each pool
+admits at most `workers + queue_limit` jobs; beyond that `run` raises
+ExecutorBusy so the API can answer 503 instead of queueing without bound.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import EMBED_WORKERS, LLM_WORKERS, INGEST_WORKERS, EXECUTOR_QUEUE_LIMIT
+
+
+class ExecutorBusy(RuntimeError):
+    """Raised when a pool already has its maximum number of queued jobs."""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, queue_limit: int = EXECUTOR_QUEUE_LIMIT):
+        self.name = name
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking callable in this pool and await its result."""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy(f"{self.name} executor is saturated")
+        # Carry contextvars (request id, etc.) into the worker thread
+        ctx = contextvars.copy_context()
+        try:
+            fut = self._pool.submit(ctx.run, fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Release on completion of the job itself, not of the awaiting coroutine
+        fut.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(fut)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+EMBED = BoundedExecutor("embed", EMBED_WORKERS)
+LLM = BoundedExecutor("llm", LLM_WORKERS)
+INGEST = BoundedExecutor("ingest", INGEST_WORKERS, queue_limit=2)
+
+
+def shutdown_all():
+    for executor in (EMBED, LLM, INGEST):
+        executor.shutdown()
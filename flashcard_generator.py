@@ -1,9 +1,8 @@
-import os
-import subprocess
 import json
 import re
 from textwrap import dedent
-from config import OLLAMA_MODEL
+import llm
+from metrics import stage, JSON_PARSE_FAILURES, ITEMS_DROPPED, LLM_ERRORS
 
 MAX_CONTEXT_CHARS = 12000  # safety guard
 
@@ -66,13 +65,43 @@ def generate_flashcards(student_info: dict, context: list | dict | str, num_card
     if not ctx_str.strip():
         return []
 
+    with stage("flashcard.build_prompt"):
+        prompt = build_flashcard_prompt(student_info, ctx_str, num_cards)
+
+    # --- Run Ollama over its HTTP API ---
+    try:
+        raw_output = llm.generate(prompt)
+    except Exception as e:
+        LLM_ERRORS.inc(generator="flashcard")
+        print("⚠️ Ollama request failed:", str(e)[:500])
+        return []
+
+    # --- Repair and parse JSON ---
+    with stage("flashcard.parse_json"):
+        json_str = repair_json_string(raw_output)
+        try:
+            cards = json.loads(json_str)
+        except json.JSONDecodeError:
+            cards = None
+    if cards is None:
+        JSON_PARSE_FAILURES.inc(generator="flashcard")
+        print("⚠️ LLM output was not valid JSON even after repairs.")
+        return []
+
+    with stage("flashcard.validate"):
+        valid_cards = validate_flashcard_list(cards)
+    if isinstance(cards, list):
+        ITEMS_DROPPED.inc(len(cards) - len(valid_cards), generator="flashcard")
+    return valid_cards or []
+
+def build_flashcard_prompt(student_info: dict, ctx_str: str, num_cards: int) -> str:
     # --- Optional trim if too long ---
     ctx_str = ctx_str.strip()
     if len(ctx_str) > MAX_CONTEXT_CHARS:
         ctx_str = ctx_str[:MAX_CONTEXT_CHARS]
 
     # --- LLM prompt ---
-    prompt = dedent(f"""
+    return dedent(f"""
     You are a flashcard content generator.
     Given the following extracted learning material, create exactly {num_cards} pairs of flashcards
     to help the student strengthen their knowledge of the key concepts.
@@ -92,33 +121,3 @@ def generate_flashcards(student_info: dict, context: list | dict | str, num_card
 
     Generate exactly {num_cards} flashcards from the above context.
     """)
-
-    # --- Run Ollama via stdin ---
-    env = os.environ.copy()
-    env["PYTHONIOENCODING"] = "utf-8"
-    env["PYTHONUTF8"] = "1"
-
-    proc = subprocess.Popen(
-        ["ollama", "run", OLLAMA_MODEL],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-        env=env
-    )
-    stdout, stderr = proc.communicate(prompt)
-
-    if stderr:
-        print("LLM stderr (sanitized):", stderr[:500])
-
-    # --- Repair and parse JSON ---
-    json_str = repair_json_string(stdout)
-    try:
-        cards = json.loads(json_str)
-    except json.JSONDecodeError:
-        print("⚠️ LLM output was not valid JSON even after repairs.")
-        return []
-
-    return validate_flashcard_list(cards) or []
\ No newline at end of file
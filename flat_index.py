@@ -0,0 +1,149 @@
+# flat_index.py
+"""
+Memory-mapped brute-force vector index for small subjects.
+
+For a few thousand chunks a single NumPy matmul is faster than going through
+Chroma's HNSW + SQLite layers, and opening a handful of .npy files with
+mmap_mode="r" is near-instant. Layout of a subject's `flat/` directory:
+
+    index.json       dtype, dim, count, embedding model, source_type / source tables
+    embeddings.npy   (N, D) float16, or int8 with per-row scales in scales.npy
+    meta.npy         structured array: source_type code, source code, chunk_index
+    texts.bin        UTF-8 chunk texts, concatenated
+    offsets.npy      (N + 1,) int64 byte offsets into texts.bin
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+META_DTYPE = np.dtype([("source_type", "u1"), ("source", "u2"), ("chunk_index", "i4")])
+DTYPES = ("float16", "int8")
+BLOCK_ROWS = 16384   # rows converted to float32 per matmul step (bounds temporary memory)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build(index_dir: Path, texts: list[str], vectors, metadatas: list[dict],
+          dtype: str = "float16", model: str = ""):
+    """Write a flat index atomically (build in a temp dir, then swap it into place)."""
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1) if texts else np.zeros((0, 0), np.float32)
+    vectors = _normalize(vectors)
+    source_types = sorted({m.get("source_type", "") for m in metadatas})
+    sources = sorted({m.get("source", "") for m in metadatas})
+    st_code = {s: i for i, s in enumerate(source_types)}
+    src_code = {s: i for i, s in enumerate(sources)}
+
+    tmp_dir = index_dir.with_name(f"{index_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    if dtype == "int8":
+        # Symmetric per-row quantization: row ≈ q * scale
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        np.save(tmp_dir / "embeddings.npy", quantized)
+        np.save(tmp_dir / "scales.npy", scales.astype(np.float32))
+    else:
+        np.save(tmp_dir / "embeddings.npy", vectors.astype(np.float16))
+
+    meta = np.zeros(len(texts), dtype=META_DTYPE)
+    for i, m in enumerate(metadatas):
+        meta[i] = (st_code[m.get("source_type", "")], src_code[m.get("source", "")], m.get("chunk_index", i))
+    np.save(tmp_dir / "meta.npy", meta)
+
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    (tmp_dir / "texts.bin").write_bytes(b"".join(encoded))
+    np.save(tmp_dir / "offsets.npy", offsets)
+
+    (tmp_dir / "index.json").write_text(json.dumps({
+        "dtype": dtype, "dim": int(vectors.shape[1]), "count": len(texts),
+        "model": model, "source_types": source_types, "sources": sources,
+    }), encoding="utf-8")
+
+    old_dir = index_dir.with_name(f"{index_dir.name}.old-{os.getpid()}")
+    if index_dir.exists():
+        index_dir.rename(old_dir)
+    tmp_dir.rename(index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def exists(index_dir: Path) -> bool:
+    return (index_dir / "index.json").exists()
+
+
+class FlatIndex:
+    """Read-only, memory-mapped view of a subject's flat index."""
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = Path(index_dir)
+        self.info = json.loads((self.index_dir / "index.json").read_text(encoding="utf-8"))
+        self.embeddings = np.load(self.index_dir / "embeddings.npy", mmap_mode="r")
+        self.scales = (np.load(self.index_dir / "scales.npy", mmap_mode="r")
+                       if self.info["dtype"] == "int8" else None)
+        self.meta = np.load(self.index_dir / "meta.npy", mmap_mode="r")
+        self.offsets = np.load(self.index_dir / "offsets.npy", mmap_mode="r")
+        self._texts = np.memmap(self.index_dir / "texts.bin", dtype=np.uint8, mode="r") \
+            if self.offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        self.source_types = self.info["source_types"]
+        self.sources = self.info["sources"]
+
+    def __len__(self) -> int:
+        return int(self.info["count"])
+
+    def text(self, i: int) -> str:
+        return bytes(self._texts[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def metadata(self, i: int) -> dict:
+        row = self.meta[i]
+        return {"source_type": self.source_types[row["source_type"]],
+                "source": self.sources[row["source"]],
+                "chunk_index": int(row["chunk_index"])}
+
+    def scores(self, query_vector) -> np.ndarray:
+        """Cosine similarity of the query against every row."""
+        q = _normalize(np.asarray(query_vector, dtype=np.float32))
+        n = len(self)
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            block = self.embeddings[start:start + BLOCK_ROWS].astype(np.float32)
+            out[start:start + BLOCK_ROWS] = block @ q
+        if self.scales is not None:
+            out *= self.scales
+        return out
+
+    def source_mask(self, source_types) -> np.ndarray | None:
+        if source_types is None:
+            return None
+        codes = [i for i, s in enumerate(self.source_types) if s in source_types]
+        return np.isin(self.meta["source_type"], codes)
+
+    def search(self, query_vector, k: int, source_types=None) -> list[int]:
+        """Row ids of the top-k rows, best first, restricted to source_types when given."""
+        if not len(self):
+            return []
+        scores = self.scores(query_vector)
+        mask = self.source_mask(source_types)
+        if mask is not None:
+            if not mask.any():
+                return []
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])].tolist()
+
+    def rows_for_source_type(self, source_type: str) -> list[int]:
+        """Row ids of one source type, in document (chunk_index) order."""
+        mask = self.source_mask([source_type])
+        rows = np.nonzero(mask)[0]
+        return rows[np.argsort(self.meta["chunk_index"][rows], kind="stable")].tolist()
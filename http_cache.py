@@ -0,0 +1,116 @@
+# http_cache.py
+"""
+Conditional responses and compression for JSON / HTML routes.
+
+Strong ETags combine the subject's ingest generation with a hash of the body,
+so they change whenever the data behind a response does. A matching
+If-None-Match on GET/HEAD gets a 304. Bodies of at least COMPRESS_MIN_BYTES are
+brotli- or gzip-compressed according to Accept-Encoding. Each encoding is a
+separate representation with its own ETag suffix.
+"""
+import gzip
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from config import COMPRESS_MIN_BYTES
+
+try:
+    import brotli   # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5   # fast enough to run per response
+
+
+def make_etag(body: bytes, generation=None) -> str:
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return f'"{generation}-{digest}"' if generation is not None else f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match uses weak comparison; the cached copy may be any encoding of the same body."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    base = etag.strip('"')
+    variants = {base} | {f"{base}-{enc}" for enc in ("gzip", "br")}
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') in variants:
+            return True
+    return False
+
+
+def choose_encoding(request: Request, size: int) -> str | None:
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = set()
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def precompress(body: bytes) -> dict:
+    """Every available encoding of a body that is served many times (e.g. the frontend)."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return {}
+    out = {"gzip": compress(body, "gzip")}
+    if brotli is not None:
+        out["br"] = compress(body, "br")
+    return out
+
+
+def _headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Response | None:
+    """304 for a GET/HEAD whose If-None-Match matches etag, else None (lets callers skip building the body)."""
+    if request.method in ("GET", "HEAD") and etag_matches(request, etag):
+        return Response(status_code=304, headers=_headers(etag, cache_control))
+    return None
+
+
+def cached_response(request: Request, body: bytes, media_type: str, etag: str,
+                    cache_control: str, compressed: dict | None = None) -> Response:
+    """304 when the client's ETag matches, else the (possibly compressed) body with caching headers."""
+    encoding = choose_encoding(request, len(body))
+    if encoding:
+        etag = f'{etag[:-1]}-{encoding}"'
+    headers = _headers(etag, cache_control)
+    if request.method in ("GET", "HEAD") and etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        body = (compressed or {}).get(encoding) or compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def json_body(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(request: Request, payload, generation=None, cache_control: str = "no-cache") -> Response:
+    body = json_body(payload)
+    return cached_response(request, body, "application/json", make_etag(body, generation), cache_control)
@@ -1,13 +1,18 @@
 import os
 import re
+import shutil
 from pathlib import Path
 from pypdf import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
-from config import DATA_DIR, CHROMA_DIR, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+from config import (DATA_DIR, CHROMA_DIR, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL,
+                    VECTOR_BACKEND, FLAT_INDEX_MAX_CHUNKS, FLAT_INDEX_DTYPE)
+from retriever import (get_embeddings, invalidate_db, flat_dir, new_chroma_dir, activate_chroma_dir,
+                       load_index_params, hnsw_metadata, bump_generation, index_size)
+from subject_registry import registry
+import flat_index
+from metrics import stage, CHUNKS_INGESTED, PAGES_EXTRACTED, PAGES_OCR
 from utils.text_utils import is_junk
-from utils.ocr_utils import ocr_page
 
 BAD_PHRASES = {"lOMoARcPSD", "Downloaded by"}
 BIBLIO_HEADINGS = re.compile(r"(?i)^\s*(Text\s*Books?|References?)\s*:?\s*$")
@@ -42,15 +47,21 @@ def clean_text(txt: str) -> str:
     cleaned = "\n".join(l.rstrip() for l in cleaned.split("\n"))
     return cleaned.strip()
 
-def extract_text(pdf_path: Path) -> str:
+def extract_text(pdf_path: Path, subject_code: str = "") -> str:
     reader = PdfReader(pdf_path)
     pages_out = []
     for i, page in enumerate(reader.pages, start=1):
-        txt = page.extract_text() or ""
-        txt = clean_text(txt)
-        if is_junk(txt):
-            txt = ocr_page(pdf_path, i)
+        with stage("ingest.extract_page"):
+            txt = page.extract_text() or ""
             txt = clean_text(txt)
+        PAGES_EXTRACTED.inc(subject=subject_code)
+        if is_junk(txt):
+            # OCR (pdf2image + pytesseract) is only imported when a page needs it
+            from utils.ocr_utils import ocr_page
+            with stage("ingest.ocr_page"):
+                txt = ocr_page(pdf_path, i)
+                txt = clean_text(txt)
+            PAGES_OCR.inc(subject=subject_code)
         pages_out.append(txt)
     return "\n\n".join(pages_out)
 
@@ -62,12 +73,29 @@ def load_folder(folder: Path, tag: str):
         if fname.lower().endswith(".pdf"):
             fpath = folder / fname
             print(f"📄 {tag.upper():11} | {fname}")
-            text = extract_text(fpath)
+            text = extract_text(fpath, subject_code=folder.parent.name)
             docs.append({"text": text, "source": fname, "source_type": tag})
     print(f"Loaded {len(docs)} documents from {tag}")
     return docs
 
+def use_flat_index(num_chunks: int) -> bool:
+    if VECTOR_BACKEND == "flat":
+        return True
+    return VECTOR_BACKEND == "auto" and num_chunks <= FLAT_INDEX_MAX_CHUNKS
+
 def ingest_all(subject_code: str):
+    """Rebuild the subject's index from its PDFs, recording progress in the subject registry."""
+    registry.register(subject_code)
+    registry.mark_ingesting(subject_code)
+    try:
+        db, backend, num_chunks = _ingest(subject_code)
+    except BaseException as e:
+        registry.mark_failed(subject_code, str(e) or type(e).__name__)
+        raise
+    registry.mark_ingested(subject_code, num_chunks, index_size(subject_code), backend)
+    return db
+
+def _ingest(subject_code: str):
     subject_dir = DATA_DIR / subject_code
     subject_dir.mkdir(parents=True, exist_ok=True)
 
@@ -84,20 +112,43 @@ def ingest_all(subject_code: str):
 
     splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     chunks, metas = [], []
-    for d in all_docs:
-        for chunk in splitter.split_text(d["text"]):
-            if chunk.strip():
-                chunks.append(chunk)
-                metas.append({
-                    "subject_code": subject_code,
-                    "source": d["source"],
-                    "source_type": d["source_type"]
-                })
+    with stage("ingest.split"):
+        for d in all_docs:
+            for chunk in splitter.split_text(d["text"]):
+                if chunk.strip():
+                    chunks.append(chunk)
+                    metas.append({
+                        "subject_code": subject_code,
+                        "source": d["source"],
+                        "source_type": d["source_type"],
+                        "chunk_index": len(chunks) - 1   # preserves document order (used for syllabus topic order)
+                    })
 
     persist_dir = CHROMA_DIR / subject_code
     persist_dir.mkdir(parents=True, exist_ok=True)
 
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    db = Chroma.from_texts(chunks, embeddings, metadatas=metas, persist_directory=str(persist_dir))
+    invalidate_db(subject_code)
+    embeddings = get_embeddings()
+    if use_flat_index(len(chunks)):
+        with stage("ingest.embed_store"):
+            vectors = embeddings.embed_documents(chunks)
+            flat_index.build(flat_dir(subject_code), chunks, vectors, metas,
+                             dtype=FLAT_INDEX_DTYPE, model=EMBEDDING_MODEL)
+        invalidate_db(subject_code)
+        bump_generation(subject_code)
+        CHUNKS_INGESTED.inc(len(chunks), subject=subject_code)
+        print(f"✅ {len(chunks)} chunks stored in flat index ({FLAT_INDEX_DTYPE}) for {subject_code}")
+        return flat_index.FlatIndex(flat_dir(subject_code)), "flat", len(chunks)
+
+    # A stale flat index would otherwise shadow the new Chroma data
+    shutil.rmtree(flat_dir(subject_code), ignore_errors=True)
+    # Build into a fresh version dir (tuned HNSW params, if any) and switch to it once complete,
+    # so a re-ingest replaces the old chunks instead of appending duplicates
+    store_dir = new_chroma_dir(subject_code)
+    with stage("ingest.embed_store"):
+        db = Chroma.from_texts(chunks, embeddings, metadatas=metas, persist_directory=str(store_dir),
+                               collection_metadata=hnsw_metadata(load_index_params(subject_code)))
+    activate_chroma_dir(subject_code, store_dir)
+    CHUNKS_INGESTED.inc(len(chunks), subject=subject_code)
     print(f"✅ {len(chunks)} chunks stored in vector DB for {subject_code}")
-    return db
\ No newline at end of file
+    return db, "chroma", len(chunks)
\ No newline at end of file
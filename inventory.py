@@ -0,0 +1,83 @@
+# inventory.py
+"""
+In-memory per-subject listing of uploaded PDFs (served by /status).
+
+Upload, delete and ingest update it directly. Each lookup stats the three
+category directories and rescans only one whose mtime changed, which catches
+edits made by other workers or by hand. /status therefore never globs the
+data directory when nothing has changed.
+"""
+import threading
+from pathlib import Path
+
+CATEGORIES = ("syllabus", "notes", "past_papers")
+
+
+def _is_pdf(path: Path) -> bool:
+    return path.suffix.lower() == ".pdf" and not path.name.startswith(".")
+
+
+class FileInventory:
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self._entries = {}   # (subject, category) -> (dir mtime_ns or None, sorted file names)
+        self._lock = threading.Lock()
+
+    def _dir(self, subject_code: str, category: str) -> Path:
+        return self.data_dir / subject_code / category
+
+    @staticmethod
+    def _mtime(path: Path):
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _scan(self, subject_code: str, category: str) -> tuple:
+        path = self._dir(subject_code, category)
+        mtime = self._mtime(path)
+        names = sorted(f.name for f in path.iterdir() if _is_pdf(f)) if mtime is not None else []
+        return mtime, names
+
+    def files(self, subject_code: str) -> dict[str, list[str]]:
+        out = {}
+        for category in CATEGORIES:
+            key = (subject_code, category)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != self._mtime(self._dir(subject_code, category)):
+                entry = self._scan(subject_code, category)
+                with self._lock:
+                    self._entries[key] = entry
+            out[category] = list(entry[1])
+        return out
+
+    def mtime(self, subject_code: str, category: str):
+        """Directory mtime to pass to add()/remove(); take it just before changing the directory."""
+        return self._mtime(self._dir(subject_code, category))
+
+    def _update(self, subject_code: str, category: str, change, before):
+        key = (subject_code, category)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return   # not listed yet; the next lookup scans
+            if entry[0] != before:
+                # Someone else changed the directory since our last scan: adopting the new
+                # mtime would hide their change, so rescan on the next lookup instead
+                del self._entries[key]
+                return
+            names = change(set(entry[1]))
+            self._entries[key] = (self._mtime(self._dir(subject_code, category)), sorted(names))
+
+    def add(self, subject_code: str, category: str, filename: str, before):
+        if _is_pdf(Path(filename)):
+            self._update(subject_code, category, lambda names: names | {filename}, before)
+
+    def remove(self, subject_code: str, category: str, filename: str, before):
+        self._update(subject_code, category, lambda names: names - {filename}, before)
+
+    def refresh(self, subject_code: str):
+        """Forget a subject's listing so the next lookup rescans it."""
+        with self._lock:
+            for category in CATEGORIES:
+                self._entries.pop((subject_code, category), None)
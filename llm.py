@@ -0,0 +1,41 @@
+# llm.py
+"""Minimal client for the Ollama HTTP API (stdlib only)."""
+import json
+import urllib.request
+from config import OLLAMA_HOST, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE, OLLAMA_TIMEOUT
+from metrics import stage
+
+
+def _post(path: str, payload: dict, timeout: float = OLLAMA_TIMEOUT) -> dict:
+    req = urllib.request.Request(
+        f"{OLLAMA_HOST.rstrip('/')}{path}",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def generate(prompt: str, model: str = OLLAMA_MODEL) -> str:
+    """Run a single non-streaming completion and return the raw text."""
+    with stage("llm.generate"):
+        data = _post("/api/generate", {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,   # keep the model resident between requests
+        })
+    return data.get("response", "")
+
+
+def ping(timeout: float = 5) -> list[str]:
+    """Check the Ollama server is reachable; return the names of installed models."""
+    with urllib.request.urlopen(f"{OLLAMA_HOST.rstrip('/')}/api/tags", timeout=timeout) as resp:
+        data = json.loads(resp.read().decode("utf-8"))
+    return [m.get("name", "") for m in data.get("models", [])]
+
+
+def warm(model: str = OLLAMA_MODEL):
+    """Load the model into memory without generating (empty prompt) and keep it there."""
+    _post("/api/generate", {"model": model, "keep_alive": OLLAMA_KEEP_ALIVE})
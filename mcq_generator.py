@@ -1,9 +1,8 @@
-import os
-import subprocess
 import json
 import re
 from textwrap import dedent
-from config import OLLAMA_MODEL
+import llm
+from metrics import stage, JSON_PARSE_FAILURES, ITEMS_DROPPED, LLM_ERRORS
 
 MAX_CONTEXT_CHARS = 12000  # safety guard; adjust as needed
 
@@ -61,16 +60,47 @@ def validate_mcq_list(mcqs):
     return cleaned
 
 
-def generate_mcqs(student_info: dict, context: str):
+def generate_mcqs(student_info: dict, context: str, num_questions: int = 10):
     if not context or not context.strip():
         return []
 
+    with stage("mcq.build_prompt"):
+        prompt = build_mcq_prompt(student_info, context, num_questions)
+
+    try:
+        raw_output = llm.generate(prompt)
+    except Exception as e:
+        LLM_ERRORS.inc(generator="mcq")
+        print("⚠️ Ollama request failed:", str(e)[:500])
+        return []
+
+    # Attempt to parse JSON
+    with stage("mcq.parse_json"):
+        json_str = repair_json_string(raw_output)
+        try:
+            mcqs = json.loads(json_str)
+        except json.JSONDecodeError:
+            mcqs = None
+    if mcqs is None:
+        JSON_PARSE_FAILURES.inc(generator="mcq")
+        print("⚠️ LLM output was not valid JSON even after repairs.")
+        return []
+
+    # Validate and clean the MCQs
+    with stage("mcq.validate"):
+        valid_mcqs = validate_mcq_list(mcqs)
+    if isinstance(mcqs, list):
+        ITEMS_DROPPED.inc(len(mcqs) - len(valid_mcqs), generator="mcq")
+    return valid_mcqs
+
+
+def build_mcq_prompt(student_info: dict, context: str, num_questions: int = 10) -> str:
     # Optional: trim very long contexts
     ctx = context.strip()
     if len(ctx) > MAX_CONTEXT_CHARS:
         ctx = ctx[:MAX_CONTEXT_CHARS]
 
-    prompt = dedent(f"""
+    return dedent(f"""
     You are a question paper generator.
     Given the following extracted exam content, create original MCQs based solely on the concepts in the text.
 
@@ -91,36 +121,5 @@ def generate_mcqs(student_info: dict, context: str):
     Context:
     \"\"\"{ctx}\"\"\"
 
-    Generate exactly 10 MCQs from the above context.
+    Generate exactly {num_questions} MCQs from the above context.
     """)
-
-    env = os.environ.copy()
-    env["PYTHONIOENCODING"] = "utf-8"
-    env["PYTHONUTF8"] = "1"
-
-    proc = subprocess.Popen(
-        ["ollama", "run", OLLAMA_MODEL],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        encoding="utf-8",
-        errors="replace",
-        env=env
-    )
-    stdout, stderr = proc.communicate(prompt)
-
-    if stderr:
-        print("LLM stderr (sanitized):", stderr[:500])
-
-    # Attempt to parse JSON
-    json_str = repair_json_string(stdout)
-    try:
-        mcqs = json.loads(json_str)
-    except json.JSONDecodeError:
-        print("⚠️ LLM output was not valid JSON even after repairs.")
-        return []
-
-    # Validate and clean the MCQs
-    valid_mcqs = validate_mcq_list(mcqs)
-    return valid_mcqs
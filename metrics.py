@@ -0,0 +1,160 @@
+# metrics.py
+"""
+Lightweight timing, tracing and Prometheus-style metrics (no external deps).
+
+- `stage("retrieval.search")` times a block into the `tutor_stage_seconds`
+  histogram and appends it to the current request's trace.
+- A request id lives in a contextvar; the app sets it per request and the
+  bounded executors copy it into worker threads, so every stage of a request
+  is attributed to it.
+- `render()` produces the text exposition format served on /metrics.
+"""
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+request_id_var = ContextVar("request_id", default=None)
+_trace_var = ContextVar("trace", default=None)   # list of (stage, seconds) for the current request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_str(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: tuple = ()):
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(n, "") for n in self.labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, buckets
+        self._values = {}   # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            row = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def snapshot(self, **labels) -> tuple[int, float]:
+        """(count, sum) observed so far for one label set."""
+        row = self._values.get(tuple(labels.get(n, "") for n in self.labels))
+        return (row[-1], row[-2]) if row else (0, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, row):
+                    cumulative += n
+                    le = _label_str(self.labels + ("le",), key + (bound,))
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_str(self.labels + ('le',), key + ('+Inf',))} {row[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {round(row[-2], 6)}")
+                lines.append(f"{self.name}_count{_label_str(self.labels, key)} {row[-1]}")
+        return lines
+
+
+REGISTRY = []
+
+# ---- metric definitions ----
+REQUEST_SECONDS = Histogram("tutor_request_seconds", "HTTP request latency by route", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("tutor_stage_seconds", "Time spent per pipeline stage", ("stage",))
+CHUNKS_INGESTED = Counter("tutor_chunks_ingested_total", "Chunks written to the vector store", ("subject",))
+PAGES_EXTRACTED = Counter("tutor_pages_extracted_total", "PDF pages processed during ingest", ("subject",))
+PAGES_OCR = Counter("tutor_pages_ocr_total", "PDF pages that fell back to OCR", ("subject",))
+JSON_PARSE_FAILURES = Counter("tutor_json_parse_failures_total", "LLM outputs that were not valid JSON after repair", ("generator",))
+ITEMS_DROPPED = Counter("tutor_items_dropped_total", "Generated items removed by validation", ("generator",))
+LLM_ERRORS = Counter("tutor_llm_errors_total", "Failed Ollama requests", ("generator",))
+SUBJECT_EVICTIONS = Counter("tutor_subject_evictions_total", "Subject indexes closed by the cache", ("reason",))
+
+
+# ---- tracing ----
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id() -> str:
+    return request_id_var.get() or "-"
+
+
+@contextmanager
+def trace_request(request_id: str | None = None):
+    """Bind a request id and an empty trace for the duration of a request/job."""
+    rid_token = request_id_var.set(request_id or new_request_id())
+    trace = []
+    trace_token = _trace_var.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace_var.reset(trace_token)
+        request_id_var.reset(rid_token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into STAGE_SECONDS and the current request's trace."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        trace = _trace_var.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+
+def server_timing(trace: list) -> str:
+    """Format a trace as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f'{name.replace(".", "_")};dur={elapsed * 1000:.1f}' for name, elapsed in trace)
+
+
+def dump_profile(path: Path, record: dict):
+    """Append one slow-request profile as a JSON line."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
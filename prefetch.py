@@ -0,0 +1,333 @@
+# prefetch.py
+"""
+Predictive prefetch for active student sessions.
+
+Students usually walk through a unit in syllabus order, so after a request for
+one topic we queue low-priority generation for the next one or two syllabus
+topics. Results land in the shared ResultCache under the topic's index, so any
+later query that matches the same syllabus topic is served from there.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    PREFETCH_AHEAD, PREFETCH_SESSION_BUDGET, PREFETCH_MAX_PENDING,
+    PREFETCH_BUSY_THRESHOLD, PREFETCH_MIN_TOPIC_SCORE, SESSION_TTL_SECONDS,
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL,
+)
+from metrics import trace_request, new_request_id
+
+TOPIC_SPLIT = re.compile(r"\n|[–—;•]|\s-\s")
+UNIT_PREFIX = re.compile(r"(?i)^\s*unit\s+[ivxlc\d]+\s*[:.\-]?\s*")
+TRAILING_HOURS = re.compile(r"\s+\d{1,2}\s*$")
+WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {"and", "the", "for", "with", "from", "into", "its", "using", "based"}
+
+
+def cache_key(kind: str, subject_code: str, query: str, params: tuple = (), generation: int = 0) -> tuple:
+    """Normalised key for a generated result; generation is the subject's ingest generation."""
+    return (kind, subject_code, " ".join(query.lower().split()), params, generation)
+
+
+def topic_key(kind: str, subject_code: str, topic_index: int, params: tuple = (), generation: int = 0) -> tuple:
+    """Key for a set prefetched for a syllabus topic (looked up for queries that closely match it)."""
+    return (kind, subject_code, topic_index, params, generation)
+
+
+def _words(text: str) -> set:
+    return {w for w in WORD.findall(text.lower()) if len(w) > 2 and w not in STOP_WORDS}
+
+
+def extract_topics(chunks: list[str]) -> list[str]:
+    """Split ordered syllabus chunks into an ordered, de-duplicated topic list."""
+    topics, seen = [], set()
+    for chunk in chunks:
+        for raw in TOPIC_SPLIT.split(chunk):
+            phrase = TRAILING_HOURS.sub("", UNIT_PREFIX.sub("", raw)).strip(" .,:")
+            if not (3 <= len(phrase) <= 80) or sum(c.isalpha() for c in phrase) < 3:
+                continue
+            norm = phrase.lower()
+            if norm in seen:   # chunk overlap repeats phrases
+                continue
+            seen.add(norm)
+            topics.append(phrase)
+    return topics
+
+
+def match_topic(topics: list[str], query: str, min_score: float = 0.0) -> int | None:
+    """Index of the syllabus topic that best matches the query (word Jaccard above min_score), or None."""
+    q = _words(query)
+    if not q:
+        return None
+    best, best_score = None, min_score
+    for i, topic in enumerate(topics):
+        t = _words(topic)
+        if not t:
+            continue
+        score = len(q & t) / len(q | t)
+        if score > best_score:
+            best, best_score = i, score
+    return best
+
+
+class ResultCache:
+    """Thread-safe LRU cache with TTL for generated MCQs/flashcards."""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value, prefetched, etag)
+        self._lock = threading.Lock()
+        self.prefetch_hits = 0
+
+    def lookup(self, key) -> tuple | None:
+        """(value, etag) for a live entry, else None; etag is None until one is stored with put()."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value, prefetched, etag = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            if prefetched:
+                # Count each prefetched result once, the first time it is served
+                self.prefetch_hits += 1
+                self._data[key] = (expires_at, value, False, etag)
+            return value, etag
+
+    def get(self, key):
+        entry = self.lookup(key)
+        return entry[0] if entry is not None else None
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def put(self, key, value, prefetched: bool = False, etag: str | None = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value, prefetched, etag)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, subject_code: str):
+        """Drop every cached result for a subject (e.g. after re-ingest)."""
+        with self._lock:
+            for key in [k for k in self._data if k[1] == subject_code]:
+                del self._data[key]
+
+
+class SessionTracker:
+    """Remembers the recent topic sequence requested by each client session."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, history: int = 20):
+        self.ttl = ttl
+        self.history = history
+        self._sessions = {}   # session_id -> {"seen": float, "topics": deque, "prefetched": int}
+        self._lock = threading.Lock()
+
+    def record(self, session_id: str, subject_code: str, query: str, topic_index: int | None) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            for sid in [s for s, v in self._sessions.items() if now - v["seen"] > self.ttl]:
+                del self._sessions[sid]
+            session = self._sessions.setdefault(
+                session_id, {"seen": now, "topics": deque(maxlen=self.history), "prefetched": 0}
+            )
+            session["seen"] = now
+            session["topics"].append((subject_code, query, topic_index))
+            return session
+
+    def active_sessions(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class Prefetcher:
+    """
+    Predicts the next syllabus topics for a session and generates them in the
+    background. `runner(kind, subject_code, query, params)` does the actual
+    retrieval + generation; `topic_loader(subject_code)` returns ordered
+    syllabus chunks; `generation_loader(subject_code)` returns the subject's
+    ingest generation, which is part of every key so that a re-ingest by any
+    process retires old topics and results.
+    """
+
+    def __init__(self, runner, topic_loader, cache: ResultCache,
+                 ahead: int = PREFETCH_AHEAD,
+                 session_budget: int = PREFETCH_SESSION_BUDGET,
+                 max_pending: int = PREFETCH_MAX_PENDING,
+                 busy_threshold: int = PREFETCH_BUSY_THRESHOLD,
+                 min_topic_score: float = PREFETCH_MIN_TOPIC_SCORE,
+                 generation_loader=lambda subject_code: 0,
+                 enabled: bool = True):
+        self.runner = runner
+        self.topic_loader = topic_loader
+        self.generation_loader = generation_loader
+        self.min_topic_score = min_topic_score
+        self.cache = cache
+        self.ahead = ahead
+        self.session_budget = session_budget
+        self.max_pending = max_pending
+        self.busy_threshold = busy_threshold
+        self.enabled = enabled
+        self.sessions = SessionTracker()
+        # A single worker keeps prefetch from competing with foreground requests
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._topics = {}     # subject_code -> (ingest generation, list[str])
+        self._pending = {}    # cache key -> Future
+        self._epochs = {}     # subject_code -> bumped by invalidate(); older prefetch results are dropped
+        self._inflight = 0    # foreground requests currently running
+        self._lock = threading.Lock()
+        self.stats = {"issued": 0, "completed": 0, "cancelled": 0, "failed": 0, "skipped_budget": 0}
+
+    # ---- load tracking ----
+    def busy(self) -> bool:
+        return self._inflight >= self.busy_threshold
+
+    def foreground(self):
+        """Context manager wrapped around every foreground generate request."""
+        return _Foreground(self)
+
+    def _enter(self):
+        with self._lock:
+            self._inflight += 1
+            if not self.busy():
+                return
+            # Under load: drop everything that has not started yet
+            for key, fut in list(self._pending.items()):
+                if fut.cancel():
+                    del self._pending[key]
+                    self.stats["cancelled"] += 1
+
+    def _exit(self):
+        with self._lock:
+            self._inflight -= 1
+
+    # ---- prediction ----
+    def topics(self, subject_code: str) -> list[str]:
+        generation = self.generation_loader(subject_code)
+        cached = self._topics.get(subject_code)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        try:
+            topics = extract_topics(self.topic_loader(subject_code))
+        except Exception as e:
+            print(f"⚠️ Prefetch could not load syllabus topics for {subject_code}: {e}")
+            topics = []
+        self._topics[subject_code] = (generation, topics)
+        return topics
+
+    def locate(self, subject_code: str, query: str) -> int | None:
+        """Syllabus topic index the query is about (None when prefetch is off or nothing matches closely)."""
+        if not self.enabled:
+            return None
+        return match_topic(self.topics(subject_code), query, self.min_topic_score)
+
+    def predict(self, subject_code: str, index: int | None, session: dict | None = None) -> tuple[int | None, list[int]]:
+        """Return (position, indexes of the next topics) for a request that matched topic `index`."""
+        topics = self.topics(subject_code)
+        if index is None and session:
+            # Unknown query: continue from the last syllabus position of this session
+            for subj, _, idx in reversed(session["topics"]):
+                if subj == subject_code and idx is not None:
+                    index = idx
+                    break
+        if index is None:
+            return None, []
+        visited = {idx for subj, _, idx in (session or {}).get("topics", ()) if subj == subject_code}
+        return index, [i for i in range(index + 1, len(topics)) if i not in visited][:self.ahead]
+
+    # ---- scheduling ----
+    def observe(self, session_id: str, subject_code: str, query: str, kind: str, params: tuple = (),
+                topic_index: int | None = None):
+        """Record a foreground request (already matched by locate()) and queue prefetch for the next topics."""
+        if not self.enabled:
+            return
+        session = self.sessions.record(session_id, subject_code, query, topic_index)
+        _, upcoming = self.predict(subject_code, topic_index, session)
+        topics = self.topics(subject_code)
+        generation = self.generation_loader(subject_code)
+
+        for i in upcoming:
+            key = topic_key(kind, subject_code, i, params, generation)
+            with self._lock:
+                if key in self._pending or key in self.cache:
+                    continue
+                if self.busy():
+                    self.stats["cancelled"] += 1
+                    continue
+                if session["prefetched"] >= self.session_budget or len(self._pending) >= self.max_pending:
+                    self.stats["skipped_budget"] += 1
+                    continue
+                session["prefetched"] += 1
+                self.stats["issued"] += 1
+                epoch = self._epochs.get(subject_code, 0)
+                self._pending[key] = self._executor.submit(
+                    self._run, key, kind, subject_code, topics[i], params, epoch)
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _run(self, key, kind, subject_code, topic, params, epoch):
+        try:
+            if self.busy():
+                self._count("cancelled")
+                return
+            with trace_request(f"prefetch-{new_request_id()}"):
+                result = self.runner(kind, subject_code, topic, params)
+            with self._lock:
+                if self._epochs.get(subject_code, 0) != epoch:
+                    self.stats["cancelled"] += 1   # subject re-ingested while this ran
+                    return
+                if result:
+                    self.cache.put(key, result, prefetched=True)
+                self.stats["completed"] += 1
+        except Exception as e:
+            self._count("failed")
+            print(f"⚠️ Prefetch failed for {subject_code} / {topic!r}: {e}")
+        finally:
+            with self._lock:
+                if self._epochs.get(subject_code, 0) == epoch:
+                    self._pending.pop(key, None)   # after invalidate() the key may belong to a newer job
+
+    def invalidate(self, subject_code: str):
+        """Forget topics, queued prefetches and cached results for a subject (after re-ingest)."""
+        with self._lock:
+            self._epochs[subject_code] = self._epochs.get(subject_code, 0) + 1
+            for key in [k for k in self._pending if k[1] == subject_code]:
+                if self._pending.pop(key).cancel():
+                    self.stats["cancelled"] += 1
+            self._topics.pop(subject_code, None)
+        self.cache.invalidate(subject_code)
+
+    def report(self) -> dict:
+        completed = self.stats["completed"]
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "hits": self.cache.prefetch_hits,
+            "hit_rate": round(self.cache.prefetch_hits / completed, 3) if completed else 0.0,
+            "active_sessions": self.sessions.active_sessions(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Foreground:
+    def __init__(self, prefetcher: Prefetcher):
+        self.prefetcher = prefetcher
+
+    def __enter__(self):
+        self.prefetcher._enter()
+
+    def __exit__(self, *exc):
+        self.prefetcher._exit()
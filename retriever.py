@@ -1,23 +1,335 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from functools import lru_cache
 from pathlib import Path
-from langchain_chroma import Chroma
-from config import CHROMA_DIR, EMBEDDING_MODEL
-from langchain_huggingface import HuggingFaceEmbeddings
+from config import (CHROMA_DIR, EMBEDDING_MODEL, EMBEDDING_SOCKET, VECTOR_BACKEND,
+                    SUBJECT_IDLE_SECONDS, SUBJECT_CACHE_MAX_BYTES, SUBJECT_EVICT_GRACE)
+from metrics import stage, SUBJECT_EVICTIONS
+from subject_registry import registry
 
-def load_db(subject_code: str):
+# langchain / torch / chroma are imported lazily so `import app` stays cheap;
+# the app's startup warm-up loads them before the first request.
+_dbs = {}
+_db_paths = {}   # subject -> Chroma directory the cached handle was opened on
+_db_bytes = {}   # subject -> on-disk index size when opened (stand-in for its memory use)
+_last_used = {}  # subject -> monotonic time of the last load_db
+_db_gens = {}    # subject -> ingest generation the cached handle was opened at
+_current = {}    # subject -> (monotonic time CURRENT was read, active Chroma directory)
+_generation = {} # subject -> (monotonic time GENERATION was read, value)
+_retired = []    # (subject, handle, monotonic time) replaced by a rebuild, released by evict_idle after the grace
+CURRENT_RECHECK_SECONDS = 2   # how long a rebuild by another process can go unnoticed
+_dbs_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def get_embeddings():
+    """Shared embedding model: the sidecar client when EMBEDDING_SOCKET is set, else loaded once per process."""
+    if EMBEDDING_SOCKET:
+        from embedding_service import RemoteEmbeddings
+        return RemoteEmbeddings(EMBEDDING_SOCKET)
+    return load_local_embeddings()
+
+def load_local_embeddings():
+    with stage("embedding.load_model"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+def is_ingested(subject_code: str) -> bool:
     persist_dir = CHROMA_DIR / subject_code
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    return Chroma(
-        persist_directory=str(persist_dir),
-        embedding_function=embeddings
-    )
+    return persist_dir.exists() and any(persist_dir.iterdir())
+
+def flat_dir(subject_code: str) -> Path:
+    return CHROMA_DIR / subject_code / "flat"
+
+def chroma_dir(subject_code: str, fresh: bool = False) -> Path:
+    """Active Chroma directory: the version named in CURRENT, or the subject dir itself for older ingests.
+
+    CURRENT is re-read at most every CURRENT_RECHECK_SECONDS (unless fresh), so the load_db
+    fast path doesn't touch the disk on every query.
+    """
+    cached = _current.get(subject_code)
+    if cached is not None and not fresh and time.monotonic() - cached[0] < CURRENT_RECHECK_SECONDS:
+        return cached[1]
+    root = CHROMA_DIR / subject_code
+    try:
+        path = root / (root / "CURRENT").read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        path = root
+    _current[subject_code] = (time.monotonic(), path)
+    return path
+
+def new_chroma_dir(subject_code: str) -> Path:
+    """Fresh version directory to build a collection in before activating it."""
+    return CHROMA_DIR / subject_code / f"hnsw-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def _is_legacy_entry(path: Path) -> bool:
+    # Pre-versioning ingests wrote chroma.sqlite3 + <uuid>/ segment dirs straight into the subject dir
+    if path.name == "chroma.sqlite3":
+        return True
+    try:
+        uuid.UUID(path.name)
+        return path.is_dir()
+    except ValueError:
+        return False
+
+def activate_chroma_dir(subject_code: str, new_dir: Path):
+    """Atomically point CURRENT at new_dir; other processes reopen within CURRENT_RECHECK_SECONDS.
+
+    The previously active version is kept for readers still using it; older ones are removed.
+    """
+    root = CHROMA_DIR / subject_code
+    previous = chroma_dir(subject_code, fresh=True)
+    tmp = root / "CURRENT.tmp"
+    tmp.write_text(new_dir.name, encoding="utf-8")
+    os.replace(tmp, root / "CURRENT")
+    _current.pop(subject_code, None)
+    invalidate_db(subject_code)
+    bump_generation(subject_code)
+    for entry in root.iterdir():
+        if entry in (new_dir, previous):
+            continue
+        if not (entry.name.startswith("hnsw-") or (previous != root and _is_legacy_entry(entry))):
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            entry.unlink(missing_ok=True)
+
+def ingest_generation(subject_code: str, fresh: bool = False) -> int:
+    """Counter bumped whenever the subject's index is rebuilt (used in HTTP ETags and cache keys).
+
+    Like CURRENT, the file is re-read at most every CURRENT_RECHECK_SECONDS unless fresh.
+    """
+    cached = _generation.get(subject_code)
+    if cached is not None and not fresh and time.monotonic() - cached[0] < CURRENT_RECHECK_SECONDS:
+        return cached[1]
+    try:
+        generation = int((CHROMA_DIR / subject_code / "GENERATION").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        generation = 0
+    _generation[subject_code] = (time.monotonic(), generation)
+    return generation
+
+def bump_generation(subject_code: str) -> int:
+    root = CHROMA_DIR / subject_code
+    root.mkdir(parents=True, exist_ok=True)
+    generation = ingest_generation(subject_code, fresh=True) + 1
+    tmp = root / "GENERATION.tmp"
+    tmp.write_text(str(generation), encoding="utf-8")
+    os.replace(tmp, root / "GENERATION")
+    _generation[subject_code] = (time.monotonic(), generation)
+    return generation
+
+def load_index_params(subject_code: str) -> dict:
+    """Per-subject HNSW settings (hnsw:space, hnsw:M, ...) plus tuning notes; {} means Chroma defaults."""
+    try:
+        return json.loads((CHROMA_DIR / subject_code / "index_params.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+def save_index_params(subject_code: str, params: dict):
+    path = CHROMA_DIR / subject_code / "index_params.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(params, indent=2), encoding="utf-8")
+
+def hnsw_metadata(params: dict) -> dict | None:
+    """The subset of index params Chroma accepts as collection metadata."""
+    return {k: v for k, v in params.items() if k.startswith("hnsw:")} or None
+
+def uses_flat(subject_code: str) -> bool:
+    """True when the subject is served from its flat index instead of Chroma."""
+    if VECTOR_BACKEND == "chroma":
+        return False
+    import flat_index
+    return flat_index.exists(flat_dir(subject_code))
+
+def index_size(subject_code: str) -> int:
+    """Bytes on disk of the index the subject is served from."""
+    path = flat_dir(subject_code) if uses_flat(subject_code) else chroma_dir(subject_code)
+    if not path.exists():
+        return 0
+    legacy = path == CHROMA_DIR / subject_code
+    return sum(f.stat().st_size for entry in path.iterdir()
+               if not legacy or _is_legacy_entry(entry)
+               for f in ([entry] if entry.is_file() else entry.rglob("*")) if f.is_file())
+
+def load_db(subject_code: str):
+    """Open (once) and return the subject's store: a Chroma collection or a FlatIndex.
+
+    Handles are opened lazily and closed again by evict_idle() or when the open
+    indexes exceed SUBJECT_CACHE_MAX_BYTES.
+    """
+    _last_used[subject_code] = time.monotonic()
+    registry.touch(subject_code)
+    db = _dbs.get(subject_code)
+    if db is not None and _is_current(subject_code, db):
+        return db
+    with _dbs_lock:
+        # A rebuild (ingest / tune_index.py, possibly in another process) bumped GENERATION
+        # or switched CURRENT: reopen
+        if subject_code in _dbs and not _is_current(subject_code, _dbs[subject_code]):
+            _retire(subject_code, _pop_handle(subject_code))
+        if subject_code not in _dbs:
+            _db_gens[subject_code] = ingest_generation(subject_code)
+        if subject_code not in _dbs and uses_flat(subject_code):
+            with stage("retrieval.open_db"):
+                from flat_index import FlatIndex
+                db = FlatIndex(flat_dir(subject_code))
+            if db.info.get("model") not in ("", EMBEDDING_MODEL):
+                print(f"⚠️ {subject_code} flat index was built with {db.info['model']}, re-ingest to use {EMBEDDING_MODEL}")
+            _dbs[subject_code] = db
+        if subject_code not in _dbs:
+            embeddings = get_embeddings()
+            with stage("retrieval.open_db"):
+                from langchain_chroma import Chroma
+                persist_dir = chroma_dir(subject_code)
+                _dbs[subject_code] = Chroma(
+                    persist_directory=str(persist_dir),
+                    embedding_function=embeddings
+                )
+                _db_paths[subject_code] = persist_dir
+        db = _dbs[subject_code]
+        measured = subject_code in _db_bytes
+    if not measured:
+        # Walking the index directory can take a while; don't hold up other subjects meanwhile
+        size = index_size(subject_code)
+        victims = []
+        with _dbs_lock:
+            if _dbs.get(subject_code) is db:
+                _db_bytes[subject_code] = size
+                victims = [(s, _pop_handle(s)) for s in _over_memory_cap(keep=subject_code)]
+        for victim, handle in victims:
+            _release(victim, handle, "memory")
+    return db
+
+def _is_current(subject_code: str, db) -> bool:
+    """False once the subject was rebuilt since the handle was opened (checked every CURRENT_RECHECK_SECONDS)."""
+    if _db_gens.get(subject_code) != ingest_generation(subject_code):
+        return False
+    return _is_flat(db) or _db_paths.get(subject_code) == chroma_dir(subject_code)
+
+def invalidate_db(subject_code: str):
+    """Drop the cached handle so the next load_db re-opens the collection.
+
+    The old handle is only released by evict_idle() once SUBJECT_EVICT_GRACE has
+    passed, as searches that fetched it just before may still be running.
+    """
+    with _dbs_lock:
+        _retire(subject_code, _pop_handle(subject_code))
+        _current.pop(subject_code, None)
+
+def _pop_handle(subject_code: str):
+    # caller holds _dbs_lock
+    _db_paths.pop(subject_code, None)
+    _db_bytes.pop(subject_code, None)
+    _db_gens.pop(subject_code, None)
+    return _dbs.pop(subject_code, None)
+
+def _retire(subject_code: str, db):
+    # caller holds _dbs_lock
+    if db is not None:
+        _retired.append((subject_code, db, time.monotonic()))
+
+def _over_memory_cap(keep: str) -> list[str]:
+    """Least recently used subjects to close so the open indexes fit SUBJECT_CACHE_MAX_BYTES."""
+    total = sum(_db_bytes.get(s, 0) for s in _dbs)
+    now = time.monotonic()
+    victims = []
+    for subject in sorted(_dbs, key=lambda s: _last_used.get(s, 0)):
+        if total <= SUBJECT_CACHE_MAX_BYTES:
+            break
+        if subject == keep or now - _last_used.get(subject, 0) < SUBJECT_EVICT_GRACE:
+            continue   # in use by a request that may still be searching it
+        victims.append(subject)
+        total -= _db_bytes.get(subject, 0)
+    return victims
+
+def _release(subject_code: str, db, reason: str):
+    """Drop a closed-out handle. FlatIndex memmaps unmap once unreferenced; Chroma keeps its
+    system (and HNSW segments) in a process-wide cache, so that entry is removed and stopped."""
+    if db is None:
+        return
+    SUBJECT_EVICTIONS.inc(reason=reason)
+    print(f"🧹 Closed {subject_code} index ({reason})")
+    if _is_flat(db):
+        return
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+        client = db._client
+        with _dbs_lock:
+            handles = list(_dbs.values()) + [handle for _, handle, _ in _retired]
+        if any(not _is_flat(h) and h._client._identifier == client._identifier for h in handles):
+            return   # reopened on the same directory: the system is shared with a handle still in use
+        system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+        if system is not None:
+            system.stop()
+    except Exception as e:   # private chromadb API; leaving it cached only costs memory
+        print(f"⚠️ Could not release Chroma resources for {subject_code}: {e}")
+
+def close_db(subject_code: str, reason: str = "removed") -> bool:
+    """Close the subject's open index, if any."""
+    with _dbs_lock:
+        db = _pop_handle(subject_code)
+    _release(subject_code, db, reason)
+    return db is not None
+
+def evict_idle(max_idle: float = SUBJECT_IDLE_SECONDS) -> list[str]:
+    """Close indexes not queried for max_idle seconds; returns the closed subjects.
+
+    Also releases handles replaced by a rebuild once SUBJECT_EVICT_GRACE has passed.
+    """
+    now = time.monotonic()
+    with _dbs_lock:
+        idle = [s for s in list(_dbs) if now - _last_used.get(s, now) > max(max_idle, SUBJECT_EVICT_GRACE)]
+        handles = [(s, _pop_handle(s)) for s in idle]
+        replaced = [(s, db) for s, db, retired_at in _retired if now - retired_at >= SUBJECT_EVICT_GRACE]
+        _retired[:] = [r for r in _retired if now - r[2] < SUBJECT_EVICT_GRACE]
+    for subject, db in replaced:
+        _release(subject, db, "rebuild")
+    for subject, db in handles:
+        _release(subject, db, "idle")
+    return idle
+
+def open_subjects() -> list[str]:
+    return sorted(_dbs)
+
+def _is_flat(db) -> bool:
+    from flat_index import FlatIndex
+    return isinstance(db, FlatIndex)
 
 def get_context_scoped(query: str, subject_code: str, k: int = 6, sources=None) -> str:
     db = load_db(subject_code)
-    results = db.similarity_search(query, k=20)
+    with stage("retrieval.embed_query"):
+        query_vector = get_embeddings().embed_query(query)
+    if _is_flat(db):
+        # Exact search: the source filter is a mask over the whole subject, not a top-20 post-filter
+        with stage("retrieval.search"):
+            rows = db.search(query_vector, k, source_types=sources)
+            if not rows and sources is not None:
+                print(f"⚠️ No matches for {sources}, retrying without filter")
+                rows = db.search(query_vector, k)
+        return "\n\n".join(db.text(i) for i in rows)
+    with stage("retrieval.search"):
+        results = db.similarity_search_by_vector(query_vector, k=20)
     hits = [r for r in results if (sources is None or r.metadata.get("source_type") in sources)]
 
     if not hits and sources is not None:
         print(f"⚠️ No matches for {sources}, retrying without filter")
         hits = results
 
-    return "\n\n".join(h.page_content for h in hits[:k])
\ No newline at end of file
+    return "\n\n".join(h.page_content for h in hits[:k])
+
+def get_syllabus_chunks(subject_code: str) -> list[str]:
+    """Return the subject's syllabus chunks in their original document order."""
+    db = load_db(subject_code)
+    if _is_flat(db):
+        return [db.text(i) for i in db.rows_for_source_type("syllabus")]
+    data = db.get(where={"source_type": "syllabus"}, include=["documents", "metadatas"])
+    docs = data.get("documents") or []
+    metas = data.get("metadatas") or [{}] * len(docs)
+    # Older ingests have no chunk_index; fall back to insertion order
+    order = sorted(range(len(docs)), key=lambda i: ((metas[i] or {}).get("chunk_index", i), i))
+    return [docs[i] for i in order]
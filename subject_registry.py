@@ -0,0 +1,141 @@
+# subject_registry.py
+"""
+Persistent registry of subjects: ingest state, chunk count, index size and last access.
+
+Backed by SQLite (WAL mode), so every API worker, the ingest CLI and batch jobs
+see the same records without coordinating. Listing subjects reads only this
+table. A new registry is seeded once with DEFAULT_SUBJECTS plus any subject
+directories already on disk.
+"""
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import SUBJECT_REGISTRY_PATH, DEFAULT_SUBJECTS, DATA_DIR, CHROMA_DIR
+
+SUBJECT_CODE = re.compile(r"^[A-Za-z0-9_-]{2,32}$")
+TOUCH_INTERVAL = 60   # seconds between last_access writes per subject (per process)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    code        TEXT PRIMARY KEY,
+    name        TEXT,
+    state       TEXT NOT NULL DEFAULT 'registered',   -- registered | ingesting | ingested | failed
+    backend     TEXT,                                 -- chroma | flat
+    chunks      INTEGER NOT NULL DEFAULT 0,
+    index_bytes INTEGER NOT NULL DEFAULT 0,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    ingested_at REAL,
+    last_access REAL
+)
+"""
+
+
+def valid_code(subject_code: str) -> bool:
+    return bool(SUBJECT_CODE.match(subject_code or ""))
+
+
+class SubjectRegistry:
+    def __init__(self, path: Path = SUBJECT_REGISTRY_PATH):
+        self.path = Path(path)
+        self._local = threading.local()   # one connection per thread
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._touched = {}                # subject -> monotonic time of the last last_access write
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute(SCHEMA)
+                    if conn.execute("SELECT COUNT(*) FROM subjects").fetchone()[0] == 0:
+                        self._seed(conn)
+                    self._initialized = True
+        return conn
+
+    def _seed(self, conn: sqlite3.Connection):
+        """One-time migration: defaults plus subject folders that already exist."""
+        from retriever import is_ingested
+        found = set(DEFAULT_SUBJECTS)
+        for root in (DATA_DIR, CHROMA_DIR):
+            if root.exists():
+                found |= {p.name for p in root.iterdir() if p.is_dir() and valid_code(p.name)}
+        now = time.time()
+        for code in sorted(found):
+            ingested = is_ingested(code)
+            conn.execute("INSERT OR IGNORE INTO subjects (code, state, created_at, ingested_at) VALUES (?, ?, ?, ?)",
+                         (code, "ingested" if ingested else "registered", now, now if ingested else None))
+        print(f"🗂️ Subject registry created at {self.path} with {len(found)} subjects")
+
+    def get(self, subject_code: str) -> dict | None:
+        row = self._conn().execute("SELECT * FROM subjects WHERE code = ?", (subject_code,)).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, subject_code: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM subjects WHERE code = ?", (subject_code,)).fetchone() is not None
+
+    def records(self) -> list[dict]:
+        return [dict(r) for r in self._conn().execute("SELECT * FROM subjects ORDER BY code")]
+
+    def codes(self) -> list[str]:
+        return [r[0] for r in self._conn().execute("SELECT code FROM subjects ORDER BY code")]
+
+    def recent(self, limit: int) -> list[str]:
+        """Subjects with an active index, most recently accessed first.
+
+        A subject whose re-ingest is running or failed still serves its previous
+        index (ingested_at stays set), so it is included.
+        """
+        rows = self._conn().execute(
+            "SELECT code FROM subjects WHERE state = 'ingested' OR ingested_at IS NOT NULL "
+            "ORDER BY COALESCE(last_access, ingested_at, 0) DESC LIMIT ?", (limit,))
+        return [r[0] for r in rows]
+
+    def register(self, subject_code: str, name: str | None = None) -> dict:
+        if not valid_code(subject_code):
+            raise ValueError("subject_code must be 2-32 letters, digits, '-' or '_'")
+        conn = self._conn()
+        conn.execute("INSERT OR IGNORE INTO subjects (code, name, created_at) VALUES (?, ?, ?)",
+                     (subject_code, name, time.time()))
+        if name is not None:
+            conn.execute("UPDATE subjects SET name = ? WHERE code = ?", (name, subject_code))
+        return self.get(subject_code)
+
+    def remove(self, subject_code: str) -> bool:
+        self._touched.pop(subject_code, None)
+        return self._conn().execute("DELETE FROM subjects WHERE code = ?", (subject_code,)).rowcount > 0
+
+    def mark_ingesting(self, subject_code: str):
+        self._conn().execute("UPDATE subjects SET state = 'ingesting', error = NULL WHERE code = ?",
+                             (subject_code,))
+
+    def mark_ingested(self, subject_code: str, chunks: int, index_bytes: int, backend: str):
+        self._conn().execute(
+            "UPDATE subjects SET state = 'ingested', chunks = ?, index_bytes = ?, backend = ?, "
+            "error = NULL, ingested_at = ? WHERE code = ?",
+            (chunks, index_bytes, backend, time.time(), subject_code))
+
+    def mark_failed(self, subject_code: str, error: str):
+        self._conn().execute("UPDATE subjects SET state = 'failed', error = ? WHERE code = ?",
+                             (error[:500], subject_code))
+
+    def touch(self, subject_code: str):
+        """Record an access; writes at most once per TOUCH_INTERVAL per subject."""
+        now = time.monotonic()
+        if now - self._touched.get(subject_code, float("-inf")) < TOUCH_INTERVAL:
+            return
+        self._touched[subject_code] = now
+        self._conn().execute("UPDATE subjects SET last_access = ? WHERE code = ?", (time.time(), subject_code))
+
+
+registry = SubjectRegistry()
@@ -0,0 +1,185 @@
+# tune_index.py
+"""
+Auto-tune a subject's HNSW parameters and rebuild its Chroma index with them.
+
+    python tune_index.py CS3491
+    python tune_index.py CS3491 --target-recall 0.98 --k 8 --dry-run
+
+Held-out chunks are used as queries against trial indexes built from the rest
+of the subject (in memory, up to --sample chunks). Each (M, construction_ef,
+search_ef) setting is scored on recall@k against exact search and on query
+latency; the fastest setting meeting the target recall wins. The full index is
+then rebuilt from the stored embeddings (no re-embedding) into a new version
+directory and activated atomically, so a running API keeps serving the old
+index until its next query picks up the new one. Do not run this while the
+same subject is being re-ingested.
+"""
+import argparse
+import itertools
+import time
+import uuid
+
+import numpy as np
+
+from config import HNSW_TARGET_RECALL, HNSW_TUNE_QUERIES, HNSW_TUNE_SAMPLE, HNSW_TUNE_GRID
+from retriever import (load_db, uses_flat, is_ingested, new_chroma_dir, activate_chroma_dir,
+                       load_index_params, save_index_params, hnsw_metadata, index_size)
+from subject_registry import registry
+
+CHROMA_DEFAULTS = {"hnsw:space": "l2", "hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 10}
+BATCH_SIZE = 4000   # stays under chroma's max batch size
+
+
+def export_collection(subject_code: str) -> tuple[list, np.ndarray, list, list]:
+    """ids, embeddings, documents and metadatas of the subject's active collection."""
+    db = load_db(subject_code)
+    ids, vectors, docs, metas = [], [], [], []
+    offset = 0
+    while True:
+        page = db.get(include=["embeddings", "documents", "metadatas"], limit=BATCH_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        ids += page["ids"]
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        docs += page["documents"]
+        metas += page["metadatas"]
+        offset += len(page["ids"])
+    return ids, (np.vstack(vectors) if vectors else np.zeros((0, 0), np.float32)), docs, metas
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int, space: str) -> list[list[int]]:
+    if space == "cosine":
+        corpus = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    scores = queries @ corpus.T
+    if space == "l2":
+        scores = 2 * scores - (corpus ** 2).sum(axis=1)   # -||q - c||² up to a per-query constant
+    return [np.argsort(-row, kind="stable")[:k].tolist() for row in scores]
+
+
+def recall(found: list[list[int]], truth: list[list[int]]) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def run_trial(client, corpus: np.ndarray, queries: np.ndarray, truth, params: dict, k: int) -> dict:
+    """Build an in-memory collection with params and measure recall@k and per-query latency."""
+    name = f"tune-{uuid.uuid4().hex[:12]}"
+    collection = client.create_collection(name, metadata=params)
+    try:
+        t0 = time.perf_counter()
+        for start in range(0, len(corpus), BATCH_SIZE):
+            end = min(len(corpus), start + BATCH_SIZE)
+            collection.add(ids=[str(i) for i in range(start, end)], embeddings=corpus[start:end].tolist())
+        build_s = time.perf_counter() - t0
+
+        collection.query(query_embeddings=queries[:5].tolist(), n_results=k)   # warm up
+        found, latencies = [], []
+        for q in queries:
+            t = time.perf_counter()
+            res = collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+            latencies.append(time.perf_counter() - t)
+            found.append([int(i) for i in res["ids"][0]])
+    finally:
+        client.delete_collection(name)
+    ms = np.asarray(latencies) * 1000
+    return {**params, "recall": round(recall(found, truth), 4), "build_s": round(build_s, 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3), "p90_ms": round(float(np.percentile(ms, 90)), 3)}
+
+
+def tune(subject_code: str, data: tuple, target_recall: float = HNSW_TARGET_RECALL, k: int = 8,
+         num_queries: int = HNSW_TUNE_QUERIES, sample: int = HNSW_TUNE_SAMPLE,
+         grid: dict = HNSW_TUNE_GRID, space: str | None = None, seed: int = 0) -> dict:
+    """Measure the grid on held-out queries from data (see export_collection).
+
+    Returns {"best", "current", "trials", ...}; "current" is the subject's existing setting.
+    """
+    import chromadb
+
+    ids, vectors = data[0], data[1]
+    if len(ids) < k + 2:
+        raise ValueError(f"{subject_code} has only {len(ids)} chunks, nothing to tune")
+    current = {**CHROMA_DEFAULTS, **(hnsw_metadata(load_index_params(subject_code)) or {})}
+    space = space or current["hnsw:space"]
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(ids))
+    num_queries = min(num_queries, max(1, len(ids) // 10))
+    queries = vectors[order[:num_queries]]
+    corpus = vectors[order[num_queries:num_queries + sample]]
+    truth = exact_topk(corpus, queries, k, space)
+    print(f"🎯 {subject_code}: {len(ids)} chunks, {len(queries)} held-out queries, "
+          f"trial indexes of {len(corpus)} chunks, space={space}, target recall@{k}={target_recall}")
+
+    client = chromadb.EphemeralClient()
+    trials = []
+    baseline = run_trial(client, corpus, queries, truth, {**current, "hnsw:space": space}, k)
+    for m, cef in itertools.product(grid["hnsw:M"], grid["hnsw:construction_ef"]):
+        for ef in sorted(grid["hnsw:search_ef"]):
+            params = {"hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": cef, "hnsw:search_ef": ef}
+            trial = run_trial(client, corpus, queries, truth, params, k)
+            trials.append(trial)
+            print(f"   M={m:<3} construction_ef={cef:<4} search_ef={ef:<4} "
+                  f"recall={trial['recall']:.3f} p50={trial['p50_ms']}ms p90={trial['p90_ms']}ms")
+            if trial["recall"] >= target_recall:
+                break   # a larger search_ef is only slower
+
+    passing = [t for t in trials if t["recall"] >= target_recall]
+    if passing:
+        best = min(passing, key=lambda t: (t["p90_ms"], t["hnsw:M"], t["hnsw:construction_ef"]))
+    else:
+        best = max(trials, key=lambda t: (t["recall"], -t["p90_ms"]))
+        print(f"⚠️ No setting reached recall {target_recall}; using the most accurate one ({best['recall']})")
+    return {"subject": subject_code, "k": k, "target_recall": target_recall, "chunks": len(ids),
+            "best": best, "current": baseline, "trials": trials}
+
+
+def rebuild(subject_code: str, params: dict, ids, vectors, docs, metas):
+    """Rebuild the subject's collection with params from stored embeddings and switch to it."""
+    from langchain_chroma import Chroma
+    store_dir = new_chroma_dir(subject_code)
+    db = Chroma(persist_directory=str(store_dir), collection_metadata=hnsw_metadata(params))
+    for start in range(0, len(ids), BATCH_SIZE):
+        end = min(len(ids), start + BATCH_SIZE)
+        db._collection.add(ids=ids[start:end], embeddings=vectors[start:end].tolist(),
+                           documents=docs[start:end], metadatas=metas[start:end])
+    save_index_params(subject_code, params)
+    activate_chroma_dir(subject_code, store_dir)
+    registry.mark_ingested(subject_code, len(ids), index_size(subject_code), "chroma")
+    print(f"✅ {subject_code} rebuilt with {hnsw_metadata(params)} in {store_dir.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-tune a subject's HNSW index")
+    parser.add_argument("subject_code")
+    parser.add_argument("--target-recall", type=float, default=HNSW_TARGET_RECALL)
+    parser.add_argument("--k", type=int, default=8, help="results per query (the app retrieves 8)")
+    parser.add_argument("--queries", type=int, default=HNSW_TUNE_QUERIES)
+    parser.add_argument("--sample", type=int, default=HNSW_TUNE_SAMPLE)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="distance (default: keep the current one)")
+    parser.add_argument("--dry-run", action="store_true", help="report the best setting without rebuilding")
+    args = parser.parse_args()
+
+    if not is_ingested(args.subject_code):
+        raise SystemExit(f"❌ {args.subject_code} is not ingested")
+    if uses_flat(args.subject_code):
+        raise SystemExit(f"❌ {args.subject_code} uses the flat index (exact search), there is nothing to tune")
+
+    data = export_collection(args.subject_code)
+    report = tune(args.subject_code, data, args.target_recall, args.k, args.queries, args.sample, space=args.space)
+    best, current = report["best"], report["current"]
+    print(f"📊 current: recall={current['recall']:.3f} p90={current['p90_ms']}ms | "
+          f"best: M={best['hnsw:M']} construction_ef={best['hnsw:construction_ef']} "
+          f"search_ef={best['hnsw:search_ef']} recall={best['recall']:.3f} p90={best['p90_ms']}ms")
+    if args.dry_run:
+        return
+
+    params = {k: v for k, v in best.items() if k.startswith("hnsw:")}
+    params.update({"tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "k": args.k,
+                   "target_recall": args.target_recall, "recall": best["recall"],
+                   "p50_ms": best["p50_ms"], "p90_ms": best["p90_ms"], "chunks": report["chunks"]})
+    rebuild(args.subject_code, params, *data)
+
+
+if __name__ == "__main__":
+    main()
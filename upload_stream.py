@@ -0,0 +1,107 @@
+# upload_stream.py
+"""
+Streaming multipart/form-data parsing for /upload.
+
+FastAPI's UploadFile is only available after Starlette has spooled the whole
+request body to a temporary file, so the body was copied twice and a chunked
+upload without Content-Length was fully received before the size check.
+Here the request stream is fed straight into python-multipart's push parser:
+the single file part goes to the caller's temp file chunk by chunk (hashed as
+it goes) and the upload is rejected with 413 as soon as it passes the limit.
+"""
+import hashlib
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+MAX_FIELD_BYTES = 4096   # plain form fields (category) are tiny
+
+
+class _Part:
+    def __init__(self):
+        self.headers = {}
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.name = None
+        self.filename = None
+        self.value = bytearray()
+
+
+async def receive_upload(request: Request, tmp_path: Path, max_bytes: int) -> dict:
+    """Stream the request's form into fields + one file written to tmp_path.
+
+    Returns {"fields": {name: str}, "filename": str, "size": int, "sha256": str}.
+    Raises HTTPException (400 malformed / no file, 413 too large); tmp_path may
+    be left behind for the caller to remove.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    fields, pieces = {}, []   # pieces: file bytes parsed from the current network chunk
+    filename = None
+    part = _Part()
+
+    def on_part_begin():
+        nonlocal part
+        part = _Part()
+
+    def on_header_field(data, start, end):
+        part.header_field += data[start:end]
+
+    def on_header_value(data, start, end):
+        part.header_value += data[start:end]
+
+    def on_header_end():
+        part.headers[bytes(part.header_field).lower()] = bytes(part.header_value)
+        part.header_field, part.header_value = bytearray(), bytearray()
+
+    def on_headers_finished():
+        nonlocal filename
+        _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" in disposition:
+            if filename is not None:
+                raise HTTPException(status_code=400, detail="Only one file per upload")
+            part.filename = filename = disposition[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(data, start, end):
+        if part.filename is not None:
+            pieces.append(bytes(data[start:end]))
+            return
+        part.value += data[start:end]
+        if len(part.value) > MAX_FIELD_BYTES:
+            raise HTTPException(status_code=400, detail=f"Form field {part.name!r} too large")
+
+    def on_part_end():
+        if part.filename is None:
+            fields[part.name] = part.value.decode("utf-8", "replace")
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field,
+        "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished, "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as out:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                for piece in pieces:
+                    size += len(piece)
+                    if size > max_bytes:
+                        raise HTTPException(status_code=413, detail="File too large")
+                    digest.update(piece)
+                    await out.write(piece)
+                pieces.clear()
+            parser.finalize()
+    except MultipartParseError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    if filename is None:
+        raise HTTPException(status_code=400, detail="No file in upload")
+    return {"fields": fields, "filename": filename, "size": size, "sha256": digest.hexdigest()}
@@ -3,7 +3,8 @@ from pdf2image import convert_from_path
 import pytesseract
 from config import POPPLER_PATH, TESSERACT_PATH
 
-pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+if TESSERACT_PATH:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
 
 def ocr_page(pdf_path, page_no):
     """Run OCR on a specific page of a PDF."""
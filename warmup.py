@@ -0,0 +1,151 @@
+# warmup.py
+"""
+Startup warm-up and readiness tracking.
+
+The FastAPI lifespan runs `run_warmup` in the background: it loads the
+embedding model, opens each ingested subject's Chroma DB and loads the Ollama
+model with keep-alive. `/readyz` reports the state of each component, and the
+time to the first successful request is recorded for cold-start tracking.
+"""
+import threading
+import time
+
+STARTED_AT = time.monotonic()   # module is imported at process start by app.py
+RETRY_AFTER_SECONDS = 30        # failed components are retried by /readyz at most this often
+
+
+class WarmupState:
+    def __init__(self):
+        self.components = {}   # name -> {"status", "seconds", "error"}
+        self.first_success_seconds = None
+        self._lock = threading.Lock()
+
+    def set(self, name: str, status: str, seconds: float | None = None, error: str | None = None):
+        with self._lock:
+            self.components[name] = {"status": status, "seconds": seconds, "error": error}
+
+    def run(self, name: str, fn, *args):
+        """Run one warm-up step, recording its duration and outcome."""
+        self.set(name, "loading")
+        t0 = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception as e:
+            self.set(name, "failed", round(time.perf_counter() - t0, 3), str(e)[:300])
+            print(f"⚠️ Warm-up of {name} failed: {e}")
+            return False
+        self.set(name, "ready", round(time.perf_counter() - t0, 3))
+        return True
+
+    def _all_ready(self) -> bool:
+        return bool(self.components) and all(
+            c["status"] in ("ready", "skipped") for c in self.components.values()
+        )
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._all_ready()
+
+    def mark_success(self):
+        """Record the time from process start to the first successful request."""
+        if self.first_success_seconds is None:
+            with self._lock:
+                if self.first_success_seconds is None:
+                    self.first_success_seconds = round(time.monotonic() - STARTED_AT, 3)
+                    print(f"⏱️ Time to first successful request: {self.first_success_seconds}s")
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._all_ready(),
+                "uptime_seconds": round(time.monotonic() - STARTED_AT, 3),
+                "time_to_first_success_seconds": self.first_success_seconds,
+                "components": {k: dict(v) for k, v in self.components.items()},
+            }
+
+
+state = WarmupState()
+
+
+def _warm_embeddings():
+    from retriever import get_embeddings
+    get_embeddings().embed_query("warm up")
+
+
+def _warm_subject(subject_code: str):
+    from retriever import get_context_scoped
+    # A tiny query pulls the index (HNSW + SQLite pages, or the flat matrix) into memory
+    get_context_scoped("warm up", subject_code, k=1)
+
+
+def _model_id(name: str) -> str:
+    """Ollama model name with the implicit ":latest" tag made explicit ("llama3" -> "llama3:latest")."""
+    name = name.strip()
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def _warm_ollama():
+    import llm
+    from config import OLLAMA_MODEL
+    models = llm.ping()
+    if models and _model_id(OLLAMA_MODEL) not in {_model_id(m) for m in models}:
+        raise RuntimeError(f"model {OLLAMA_MODEL} not pulled (have: {', '.join(models)})")
+    llm.warm()
+
+
+def register(subjects: list[str]):
+    """Mark every component as pending so /readyz is accurate before warm-up starts."""
+    from retriever import is_ingested
+    state.set("embeddings", "pending")
+    state.set("ollama", "pending")
+    for subject_code in subjects:
+        if is_ingested(subject_code):
+            state.set(f"chroma:{subject_code}", "pending")
+        else:
+            state.set(f"chroma:{subject_code}", "skipped", error="not ingested")
+
+
+def _pending(name: str) -> bool:
+    return state.components.get(name, {}).get("status") == "pending"
+
+
+def run_warmup(subjects: list[str]):
+    """Blocking warm-up of all pending components; run it off the event loop."""
+    t0 = time.perf_counter()
+    if _pending("embeddings"):
+        state.run("embeddings", _warm_embeddings)
+    embeddings_ok = state.components.get("embeddings", {}).get("status") == "ready"
+    for subject_code in subjects:
+        name = f"chroma:{subject_code}"
+        if not _pending(name):
+            continue
+        if embeddings_ok:
+            state.run(name, _warm_subject, subject_code)
+        else:
+            state.set(name, "failed", error="embedding model unavailable")
+    if _pending("ollama"):
+        state.run("ollama", _warm_ollama)
+    print(f"🔥 Warm-up finished in {time.perf_counter() - t0:.1f}s (ready={state.ready})")
+
+
+_retry_lock = threading.Lock()
+_last_retry = 0.0
+
+
+def retry_failed(subjects: list[str]) -> bool:
+    """Re-run warm-up for failed components (e.g. Ollama started after the API). Rate-limited."""
+    global _last_retry
+    if not any(c["status"] == "failed" for c in state.report()["components"].values()):
+        return False
+    if time.monotonic() - _last_retry < RETRY_AFTER_SECONDS or not _retry_lock.acquire(blocking=False):
+        return False
+    try:
+        _last_retry = time.monotonic()
+        for name, component in state.report()["components"].items():
+            if component["status"] == "failed":
+                state.set(name, "pending")
+        run_warmup(subjects)
+        return True
+    finally:
+        _retry_lock.release()